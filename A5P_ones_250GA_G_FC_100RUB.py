@@ -1,7 +1,20 @@
-import time
+import os
 from itertools import product
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
 
+from browser_server import ENDPOINT_ENV, open_browser
+from readiness import (
+    WAIT_TIMES,
+    install_network_tracker,
+    wait_menu_ready,
+    wait_network_idle,
+    wait_price_button,
+    wait_selection,
+    wait_widget_ready,
+)
+from request_filter import RequestFilter
+
 URL = "https://www.cmykonline.com.au/booklets-magazines/perfect-binding/perfect-bound-48pp-plus/"
 
 COVER_PRINTING = {"Full Colour (CMYK) one side": "ones"}
@@ -35,6 +48,15 @@ def ensure_page_alive(page):
         raise Exception("Page was closed by widget reload")
 
 
+def settle(page):
+    # Retry backoff: let whatever the widget is doing finish instead of
+    # sleeping a fixed 600 ms
+    try:
+        wait_network_idle(page, timeout=5000)
+    except PlaywrightTimeoutError:
+        pass
+
+
 # =====================================================
 # PRINTIQ-SAFE DROPDOWN SELECTOR
 # =====================================================
@@ -54,7 +76,7 @@ def select_option(page, label_text, value, retries=10):
 
             # Open dropdown (do NOT wait for menu visibility)
             group.locator("a.dropdown-toggle.filter-button").click(force=True)
-            page.wait_for_timeout(200)  # allow animation frame
+            wait_menu_ready(group)
 
             menu = group.locator("ul.dropdown-menu")
 
@@ -68,16 +90,15 @@ def select_option(page, label_text, value, retries=10):
                     has_text=value_str
                 ).first.click(force=True)
 
-            page.wait_for_timeout(300)
-
-            if value_str in group.locator(".filter-text").inner_text():
+            try:
+                wait_selection(page, group, value_str)
                 return
-
-            raise Exception("Selection did not stick")
+            except PlaywrightTimeoutError:
+                raise Exception("Selection did not stick")
 
         except Exception as e:
             log(f"Retrying dropdown: {e}")
-            page.wait_for_timeout(600)
+            settle(page)
 
     raise Exception(f'FAILED selecting "{value_str}" for "{label_text}"')
 
@@ -97,7 +118,7 @@ def force_internal_printing(page, value):
             )
             group.wait_for(state="visible", timeout=15000)
             group.locator("a.dropdown-toggle.filter-button").click(force=True)
-            page.wait_for_timeout(200)
+            wait_menu_ready(group)
 
             option = group.locator(
                 "ul.dropdown-menu a.filter-option",
@@ -105,15 +126,14 @@ def force_internal_printing(page, value):
             ).first
 
             option.click(force=True)
-            page.wait_for_timeout(400)
+            wait_selection(page, group, value)
 
-            if value in group.locator(".filter-text").inner_text():
-                log("Internal printing locked ✅")
-                return
+            log("Internal printing locked ✅")
+            return
 
         except Exception as e:
             log(f"Retry internal printing: {e}")
-            page.wait_for_timeout(600)
+            settle(page)
 
     raise Exception("Internal/Text Pages Printing NOT locked")
 
@@ -124,23 +144,15 @@ def force_internal_printing(page, value):
 def apply_current_config(page, cp, cs, lm, ip, ist, pg):
     ensure_page_alive(page)
 
-    page.wait_for_load_state("networkidle")
-    time.sleep(2)
+    wait_widget_ready(page)
 
     select_option(page, "Finished Size (mm)", "A5 Portrait - 148x210")
-    time.sleep(0.5)
     select_option(page, "Cover Printing", cp)
-    time.sleep(0.5)
     select_option(page, "Cover Stock", cs)
-    time.sleep(0.5)
     select_option(page, "Cover Laminate (outside only)", lm)
-    time.sleep(0.5)
     force_internal_printing(page, ip)
-    time.sleep(0.5)
     select_option(page, "Internal/Text Pages Stock", ist)
-    time.sleep(0.5)
     select_option(page, "Internal/Text Pages (pp) Excluding Cover", pg)
-    time.sleep(0.5)
 
 
 # =====================================================
@@ -149,6 +161,7 @@ def apply_current_config(page, cp, cs, lm, ip, ist, pg):
 def get_price(page):
     ensure_page_alive(page)
 
+    wait_price_button(page)
     page.locator(
         "a.btn.btn-success.continue-button.filter-price-button"
     ).click(force=True)
@@ -166,12 +179,21 @@ def get_price(page):
 # MAIN
 # =====================================================
 with sync_playwright() as p:
-    log("Launching browser")
-    browser = p.firefox.launch(headless=True, slow_mo=120)
-    page = browser.new_page()
+    # Firefox with slow_mo as always; BROWSER_ENDPOINT may name a
+    # browser_server.py --browser firefox to attach to instead
+    log("Opening browser")
+    browser, _ = open_browser(
+        p, os.environ.get(ENDPOINT_ENV),
+        lambda: p.firefox.launch(headless=True, slow_mo=120),
+        engine="firefox", slow_mo=120,
+    )
+    page = browser.new_context().new_page()
+    asset_filter = RequestFilter(URL)
+    asset_filter.install(page)
+    install_network_tracker(page)
 
     page.goto(URL, timeout=60000)
-    page.wait_for_load_state("networkidle")
+    wait_widget_ready(page)
     log("Page loaded")
 
     
@@ -181,17 +203,11 @@ with sync_playwright() as p:
     ip = list(INTERNAL_PRINTING.keys())[0]
     ist = list(INTERNAL_STOCK.keys())[0]
 
-    time.sleep(3)
     select_option(page, "Finished Size (mm)", "A5 Portrait - 148x210")
-    time.sleep(1)
     select_option(page, "Cover Printing", cp)
-    time.sleep(1)
     select_option(page, "Cover Stock", cs)
-    time.sleep(1)
     select_option(page, "Cover Laminate (outside only)", lm)
-    time.sleep(1)
     force_internal_printing(page, ip)
-    time.sleep(1)
     select_option(page, "Internal/Text Pages Stock", ist)
 
     for cp, cs, lm, ip, ist, pg in product(
@@ -215,7 +231,6 @@ with sync_playwright() as p:
             f.write(config + "\n")
 
             try:
-                time.sleep(1)
                 select_option(page, "Internal/Text Pages (pp) Excluding Cover", pg)
                 
                 for qty in QUANTITIES:
@@ -256,4 +271,7 @@ with sync_playwright() as p:
     log("Closing browser")
     browser.close()
 
+log(f"Request filter: {asset_filter.summary()}")
+for row in WAIT_TIMES.summary():
+    log(f"WAIT {row}")
 log("DONE ✔ Output written to A5_PERFECT_BOUND_OUTPUT.txt")
@@ -0,0 +1,252 @@
+import email.utils
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+# =====================================================
+# PERSISTENT STATIC-ASSET CACHE
+# =====================================================
+# Routed browsers skip Chromium's own HTTP cache, and every run starts a
+# fresh profile anyway, so the widget bundle and site CSS used to be
+# downloaded again for every context and every reload. This cache keeps
+# them on disk across runs:
+#
+#   .asset_cache/index.sqlite3      url → digest, headers, validators
+#   .asset_cache/objects/ab/abcd…   bodies, named by sha256 (shared by
+#                                   URLs that differ only in cache-busters)
+#
+# A fresh entry (max-age / Expires) is served straight from disk; a
+# stale one is revalidated with If-None-Match / If-Modified-Since and a
+# 304 serves the disk copy. Least recently used bodies are evicted once
+# the cache grows past max_bytes.
+
+CACHE_DIR = ".asset_cache"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+CACHEABLE_TYPES = {"script", "stylesheet"}
+
+# Decoded bodies are stored, so these no longer describe them
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding",
+                "connection", "keep-alive", "set-cookie"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url           TEXT PRIMARY KEY,
+    digest        TEXT    NOT NULL,
+    size          INTEGER NOT NULL,
+    status        INTEGER NOT NULL,
+    headers       TEXT    NOT NULL,  -- JSON, minus DROP_HEADERS
+    etag          TEXT,
+    last_modified TEXT,
+    expires_at    REAL    NOT NULL,  -- fresh until (epoch seconds)
+    last_used     REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+"""
+
+
+def freshness(headers, now):
+    # Epoch seconds the response stays fresh until; now if it must be
+    # revalidated every time
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-cache" in cache_control:
+        return now
+    m = re.search(r"max-age=(\d+)", cache_control)
+    if m:
+        return now + int(m.group(1))
+    if headers.get("expires"):
+        try:
+            return email.utils.parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return now
+    return now
+
+
+def storable(status, headers):
+    cache_control = headers.get("cache-control", "").lower()
+    return status == 200 and "no-store" not in cache_control \
+        and "private" not in cache_control
+
+
+class AssetCache:
+    def __init__(self, path=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+
+        # Route handlers run on every worker's thread
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, "index.sqlite3"),
+                                    timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.counts = Counter()
+        self.bytes_from_disk = 0
+
+    def handles(self, request):
+        return request.method == "GET" and request.resource_type in CACHEABLE_TYPES
+
+    # Blobs
+    def blob_path(self, digest):
+        return os.path.join(self.path, "objects", digest[:2], digest)
+
+    def write_blob(self, body):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        return digest
+
+    def read_blob(self, digest):
+        try:
+            with open(self.blob_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # Index
+    def lookup(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT digest, status, headers, etag, last_modified, expires_at "
+                "FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("digest", "status", "headers", "etag", "last_modified", "expires_at")
+        entry = dict(zip(keys, row))
+        entry["headers"] = json.loads(entry["headers"])
+        return entry
+
+    def store(self, url, status, headers, body):
+        now = time.time()
+        kept = {k: v for k, v in headers.items() if k.lower() not in DROP_HEADERS}
+        digest = self.write_blob(body)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, len(body), status, json.dumps(kept),
+                 headers.get("etag"), headers.get("last-modified"),
+                 freshness(headers, now), now),
+            )
+        self.evict()
+
+    def touch(self, url, expires_at=None):
+        with self.lock, self.conn:
+            if expires_at is None:
+                self.conn.execute("UPDATE entries SET last_used = ? WHERE url = ?",
+                                  (time.time(), url))
+            else:
+                self.conn.execute(
+                    "UPDATE entries SET last_used = ?, expires_at = ? WHERE url = ?",
+                    (time.time(), expires_at, url),
+                )
+
+    def evict(self):
+        with self.lock:
+            total = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT DISTINCT digest, size FROM entries)"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self.conn.execute(
+                "SELECT url, digest, size FROM entries ORDER BY last_used"
+            ).fetchall()
+            dropped = []
+            with self.conn:
+                for url, digest, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                    still_used = self.conn.execute(
+                        "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+                    ).fetchone()
+                    if not still_used:
+                        total -= size
+                        dropped.append(digest)
+                    self.counts["evicted"] += 1
+        for digest in dropped:
+            try:
+                os.remove(self.blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    # Route handling
+    def fulfill(self, route, entry, body):
+        route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+        with self.lock:
+            self.bytes_from_disk += len(body)
+
+    def serve(self, route):
+        url = route.request.url
+        entry = self.lookup(url)
+        body = self.read_blob(entry["digest"]) if entry else None
+        if entry and body is None:
+            entry = None  # blob lost; refetch
+
+        if entry and time.time() < entry["expires_at"]:
+            self.touch(url)
+            self.fulfill(route, entry, body)
+            self.count("hit")
+            return
+
+        headers = dict(route.request.headers)
+        if entry and entry["etag"]:
+            headers["if-none-match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["if-modified-since"] = entry["last_modified"]
+
+        try:
+            response = route.fetch(headers=headers)
+        except Exception:
+            if entry:
+                # Offline or flaky: a stale copy beats a broken widget
+                self.fulfill(route, entry, body)
+                self.count("stale")
+            else:
+                route.continue_()
+                self.count("error")
+            return
+
+        if entry and response.status == 304:
+            self.touch(url, freshness(response.headers, time.time()))
+            self.fulfill(route, entry, body)
+            self.count("revalidated")
+            return
+
+        fetched = response.body()
+        if storable(response.status, response.headers):
+            self.store(url, response.status, response.headers, fetched)
+        route.fulfill(response=response, body=fetched)
+        self.count("miss")
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def summary(self):
+        with self.lock:
+            served = sum(self.counts[k] for k in ("hit", "revalidated", "stale"))
+            total = served + self.counts["miss"] + self.counts["error"]
+            ratio = served / total if total else 0.0
+            return (
+                f"{ratio:.0%} hit ratio ({self.counts['hit']} fresh, "
+                f"{self.counts['revalidated']} revalidated, "
+                f"{self.counts['stale']} stale, {self.counts['miss']} misses), "
+                f"{self.bytes_from_disk / 1_000_000:.1f} MB from disk, "
+                f"{self.counts['evicted']} evicted"
+            )
@@ -0,0 +1,562 @@
+import argparse
+import asyncio
+import os
+import re
+import time
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+import scrapper
+from browser_server import ENDPOINT_ENV, endpoint_engine, wait_healthy
+from dependencies import ChangePlan
+from instrument import count_attempt, instrumented
+from instrument import dump as dump_step_timings
+from instrument import enable as enable_instrumentation
+from journal import JOURNAL_FILE, ProgressJournal
+from planner import delta
+from price_capture import (
+    PRICE_BUTTON,
+    PRICE_CHANGED_JS,
+    PRICE_SOURCES,
+    PRICE_TEXT,
+    PRICE_TEXT_JS,
+    is_price_response,
+    parse_price_payload,
+)
+from price_store import FINISHED_SIZE, STORE_FILE, PriceStore
+from readiness import (
+    NETWORK_IDLE_JS,
+    NETWORK_TRACKER_JS,
+    PRICE_BUTTON_READY_JS,
+    WAIT_TIMES,
+    timed_wait,
+)
+from request_filter import ALLOW_HOSTS, RequestFilter
+from scrapper import CONFIG_LABELS, config_name, expected_selections, log
+from selection_cache import (
+    WIDGET_OBSERVER_JS,
+    WIDGET_TOKEN_JS,
+    cache_for,
+    cache_summary,
+    count_lookup,
+    forget_selection,
+)
+from widget_state import READ_SELECTIONS_JS, RECOVERIES
+
+# =====================================================
+# ASYNCIO ENGINE
+# =====================================================
+# The same widget steps as scrapper.py on playwright.async_api: one
+# process, one event loop, dozens of pages in one browser. Pages spend
+# nearly all their time waiting on the widget, so a page is a task, not a
+# thread with its own driver. A semaphore bounds the widget round trips
+# (page loads and price clicks) in flight at once, so --pages can grow
+# without hammering the site.
+#
+# Cancellation (Ctrl-C, a price timeout) is never retried: retry loops
+# let CancelledError through, and the page's selection cache is dropped
+# first, because a half-finished click leaves the widget in an unknown
+# state.
+#
+#     python async_engine.py --pages 24 --in-flight 6
+
+# Bounds page loads and price clicks across all pages; set up in run()
+IN_FLIGHT = None
+
+# Seconds one price click may take before it's abandoned and retried
+PRICE_TIMEOUT = 30.0
+
+
+def ensure_page_alive(page):
+    if page.is_closed():
+        raise Exception("Page was closed by widget reload")
+
+
+# =====================================================
+# READINESS WAITS (readiness.py, awaited)
+# =====================================================
+async def install_page_scripts(page):
+    for script in (NETWORK_TRACKER_JS, WIDGET_OBSERVER_JS):
+        await page.add_init_script(script)
+        await page.evaluate(script)
+
+
+async def wait_network_idle(page, quiet_ms=150, timeout=15000):
+    with timed_wait("network_idle"):
+        await page.wait_for_function(NETWORK_IDLE_JS, arg=quiet_ms,
+                                     timeout=timeout)
+
+
+async def wait_widget_ready(page, timeout=30000):
+    with timed_wait("widget_ready"):
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+        await page.locator(
+            ".control-group a.dropdown-toggle.filter-button"
+        ).first.wait_for(state="visible", timeout=timeout)
+    await wait_network_idle(page, timeout=timeout)
+
+
+async def wait_menu_ready(group, timeout=5000):
+    with timed_wait("menu_ready"):
+        await group.locator("ul.dropdown-menu a.filter-option").first.wait_for(
+            state="attached", timeout=timeout
+        )
+
+
+async def wait_selection(page, group, value, timeout=5000):
+    with timed_wait("filter_text"):
+        await group.locator(".filter-text", has_text=str(value)).wait_for(
+            state="attached", timeout=timeout
+        )
+    await wait_network_idle(page, timeout=timeout)
+
+
+async def wait_price_button(page, timeout=15000):
+    with timed_wait("price_button"):
+        await page.wait_for_function(PRICE_BUTTON_READY_JS, arg=PRICE_BUTTON,
+                                     timeout=timeout)
+
+
+async def settle(page):
+    try:
+        await wait_network_idle(page, timeout=5000)
+    except PlaywrightTimeoutError:
+        pass
+
+
+# =====================================================
+# SELECTION CACHE (selection_cache.py, awaited)
+# =====================================================
+async def widget_token(page):
+    return tuple(await page.evaluate(WIDGET_TOKEN_JS))
+
+
+async def already_selected(page, label, value):
+    token = await widget_token(page)
+    return count_lookup(cache_for(page).lookup_token(token, label, value))
+
+
+async def remember_selection(page, label, value, token=None):
+    if token is None:
+        token = await widget_token(page)
+    cache_for(page).store_token(token, label, value)
+
+
+# =====================================================
+# CANCELLATION-SAFE RETRIES
+# =====================================================
+async def retrying(page, what, attempts, action):
+    # action(attempt) is awaited up to attempts times; widget errors are
+    # retried after the page settles, cancellation goes straight up
+    for attempt in range(1, attempts + 1):
+        count_attempt()
+        try:
+            return await action(attempt)
+        except asyncio.CancelledError:
+            forget_selection(page)
+            raise
+        except Exception as e:
+            log(f"Retrying {what}: {e}")
+            await settle(page)
+    raise Exception(f"FAILED {what}")
+
+
+# =====================================================
+# WIDGET STEPS
+# =====================================================
+def control_group(page, label_text):
+    return page.locator(
+        f'.control-group:has(label.control-label:has-text("{label_text}"))'
+    )
+
+
+@instrumented("select_option", label_arg=1)
+async def select_option(page, label_text, value, retries=10):
+    value_str = str(value)
+
+    if scrapper.SELECTION_CACHE and await already_selected(page, label_text,
+                                                            value_str):
+        return
+
+    async def attempt(n):
+        ensure_page_alive(page)
+        log(f'Selecting "{value_str}" for "{label_text}" (attempt {n})')
+
+        group = control_group(page, label_text)
+        await group.wait_for(state="visible", timeout=15000)
+        await group.scroll_into_view_if_needed()
+        await group.locator("a.dropdown-toggle.filter-button").click(force=True)
+        await wait_menu_ready(group)
+
+        menu = group.locator("ul.dropdown-menu")
+        numeric = menu.locator(f'li[data-value="{value_str}"] a.filter-option')
+        if await numeric.count() > 0:
+            await numeric.first.click(force=True)
+        else:
+            await menu.locator(
+                "a.filter-option", has_text=value_str
+            ).first.click(force=True)
+
+        try:
+            await wait_selection(page, group, value_str)
+        except PlaywrightTimeoutError:
+            raise Exception("Selection did not stick")
+        await remember_selection(page, label_text, value_str)
+
+    await retrying(page, f'selecting "{value_str}" for "{label_text}"',
+                   retries, attempt)
+
+
+@instrumented("force_internal_printing")
+async def force_internal_printing(page, value):
+    label_text = "Internal/Text Pages Printing"
+    if scrapper.SELECTION_CACHE and await already_selected(page, label_text,
+                                                            value):
+        return
+
+    log("FORCING Internal/Text Pages Printing")
+
+    async def attempt(n):
+        ensure_page_alive(page)
+        group = control_group(page, label_text)
+        await group.wait_for(state="visible", timeout=15000)
+        await group.locator("a.dropdown-toggle.filter-button").click(force=True)
+        await wait_menu_ready(group)
+        await group.locator(
+            "ul.dropdown-menu a.filter-option", has_text=value
+        ).first.click(force=True)
+        await wait_selection(page, group, value)
+        await remember_selection(page, label_text, value)
+        log("Internal printing locked ✅")
+
+    await retrying(page, "internal printing", 3, attempt)
+
+
+async def select_dropdown(page, label, value):
+    if label == "Internal/Text Pages Printing":
+        await force_internal_printing(page, value)
+    else:
+        await select_option(page, label, value)
+
+
+async def read_dom_price(page, before=None):
+    # scrapper.read_dom_price: waits for the text shown before the click
+    # to be replaced
+    await page.wait_for_selector(PRICE_TEXT, timeout=20000)
+    if before is not None:
+        try:
+            await page.wait_for_function(
+                PRICE_CHANGED_JS, arg=[PRICE_TEXT, before], timeout=20000
+            )
+        except PlaywrightTimeoutError:
+            raise Exception(f"Shown price stayed at {before} after the click")
+    raw = await page.locator(PRICE_TEXT).inner_text()
+    return float(raw.replace("$", "").replace(",", "").strip())
+
+
+async def read_price(page):
+    # Click and read, once a slot in IN_FLIGHT is held
+    before = None
+    if scrapper.CAPTURE_XHR:
+        # For the fallback: the DOM may still show the last price
+        before = await page.evaluate(PRICE_TEXT_JS, PRICE_TEXT)
+        try:
+            async with page.expect_response(
+                lambda r: is_price_response(r, scrapper.PRICE_URL),
+                timeout=20000,
+            ) as info:
+                await page.locator(PRICE_BUTTON).click(force=True)
+            response = await info.value
+            price = parse_price_payload(await response.json())
+            PRICE_SOURCES.record("xhr")
+            log(f"Price {price:.2f} from pricing XHR")
+            return price
+        except Exception as e:
+            log(f"XHR capture failed, falling back to DOM: {e}")
+    else:
+        await page.locator(PRICE_BUTTON).click(force=True)
+
+    price = await read_dom_price(page, before)
+    PRICE_SOURCES.record("dom")
+    return price
+
+
+@instrumented("get_price")
+async def get_price(page):
+    ensure_page_alive(page)
+    await wait_price_button(page)
+
+    async with IN_FLIGHT:
+        # Only the click and read are timed, not the wait for a slot: a
+        # page queued behind slow reads hasn't asked the site anything.
+        # wait_for cancels the click on timeout; price_quantity's reload
+        # then starts from a clean cache.
+        return await asyncio.wait_for(read_price(page), PRICE_TIMEOUT)
+
+
+# =====================================================
+# CONFIG STEPS
+# =====================================================
+async def open_widget(page, cfg):
+    with timed_wait("widget_setup"):
+        await install_page_scripts(page)
+        async with IN_FLIGHT:
+            await page.goto(scrapper.URL, timeout=60000)
+            await wait_widget_ready(page)
+        log("Page loaded")
+
+        cp, cs, lm, ip, ist, pg = cfg
+        await select_option(page, "Finished Size (mm)", FINISHED_SIZE)
+        await select_option(page, "Cover Printing", cp)
+        await select_option(page, "Cover Stock", cs)
+        await select_option(page, "Cover Laminate (outside only)", lm)
+        # Changing the stock resets the printing (planner.RESETS)
+        await select_option(page, "Internal/Text Pages Stock", ist)
+        await force_internal_printing(page, ip)
+
+    return (cp, cs, lm, ip, ist, None)
+
+
+async def apply_changes(page, changes, cfg, max_passes=3):
+    # scrapper.apply_changes, on the same dependencies.ChangePlan
+    plan = ChangePlan(expected_selections(cfg), changes,
+                      max_passes=max_passes)
+    while plan.pending:
+        label, value = plan.next()
+        await select_dropdown(page, label, value)
+
+        on_screen = await page.evaluate(READ_SELECTIONS_JS)
+        forget, keep = plan.after(label, on_screen, log)
+        token = await widget_token(page) if keep else None  # once per pass
+        for other, want in keep:
+            await remember_selection(page, other, want, token)
+        for other in forget:
+            forget_selection(page, other)
+
+
+@instrumented("page.reload")
+async def reload_page(page):
+    async with IN_FLIGHT:
+        await page.reload(timeout=60000)
+        await wait_widget_ready(page)
+
+
+async def recover(page, cfg):
+    # Reload and replay the whole config; the sync engine's storage
+    # restore is not ported
+    started = time.perf_counter()
+    forget_selection(page)
+    await reload_page(page)
+    wanted = [("Finished Size (mm)", FINISHED_SIZE)] + list(zip(CONFIG_LABELS, cfg))
+    await apply_changes(page, wanted, cfg)
+
+    elapsed = time.perf_counter() - started
+    RECOVERIES.record("replayed", elapsed, len(wanted))
+    log(f"Recovered in {elapsed:.1f}s (replayed, {len(wanted)} dropdowns replayed)")
+
+
+async def price_quantity(page, cfg, qty):
+    for attempt in range(1, 3):  # retry once after reload
+        try:
+            await select_option(page, "Quantity", qty)
+            price = await get_price(page)
+
+            final_price = price - 10
+            print(f"{price} {final_price:.2f}", flush=True)
+            return final_price
+
+        except asyncio.TimeoutError:
+            log(f"QTY ERROR (qty={qty}) ❌ no price after {PRICE_TIMEOUT:.0f}s")
+            forget_selection(page)
+        except Exception as e:
+            log(f"QTY ERROR (qty={qty}) ❌ {e}")
+
+        if attempt == 2:
+            return None
+        log("Reloading page and restoring config…")
+        await recover(page, cfg)
+
+
+async def scrape_config(page, writer, cfg, previous=None):
+    log("=" * 60)
+    log(f"START CONFIG: {config_name(*cfg)}")
+
+    results = []
+    error = None
+    try:
+        changes = delta(CONFIG_LABELS, previous, cfg)
+        if previous is not None and previous[:-1] != cfg[:-1]:
+            with timed_wait("prefix_switch"):
+                await apply_changes(page, changes, cfg)
+        else:
+            await apply_changes(page, changes, cfg)
+
+        for qty in scrapper.QUANTITIES:
+            if scrapper.JOURNAL and scrapper.JOURNAL.is_done(cfg, qty):
+                continue
+            results.append((qty, await price_quantity(page, cfg, qty), "scraped"))
+
+    except Exception as e:
+        log(f"CONFIG ERROR ❌ {e}")
+        error = str(e)
+
+    # Journaled by the store after it committed the rows
+    priced = [(qty, price) for qty, price, _ in results if price is not None]
+    writer.write_config(cfg, results, error, journal=priced)
+    return error is None
+
+
+# =====================================================
+# PAGES
+# =====================================================
+async def run_page(page_id, browser, configs, writer):
+    context = await browser.new_context()
+    try:
+        if scrapper.REQUEST_FILTER:
+            await scrapper.REQUEST_FILTER.install_async(context)
+        page = await context.new_page()
+        log(f"Page {page_id}: {len(configs)} configs")
+
+        previous = await open_widget(page, configs[0])
+        for cfg in configs:
+            ok = await scrape_config(page, writer, cfg, previous)
+            previous = cfg if ok else None
+    except asyncio.CancelledError:
+        log(f"Page {page_id} cancelled")
+        raise
+    except Exception as e:
+        log(f"PAGE {page_id} FAILED ❌ {e}")
+    finally:
+        await context.close()
+
+    log(f"Page {page_id} done")
+
+
+async def run(configs, writer, pages, in_flight, endpoint=None):
+    global IN_FLIGHT
+    IN_FLIGHT = asyncio.Semaphore(in_flight)
+    chunks = [c for c in scrapper.partition(configs, pages) if c]
+
+    async with async_playwright() as p:
+        if endpoint:
+            if endpoint_engine(endpoint) != "chromium":
+                raise ValueError(f"{endpoint} is not a Chromium browser_server.py")
+            if not await asyncio.to_thread(wait_healthy, endpoint, 60.0):
+                raise RuntimeError(f"No browser server answering on {endpoint}")
+            browser = await p.chromium.connect(endpoint)
+            log(f"Attached to browser server {endpoint}")
+        else:
+            log("Launching browser")
+            browser = await p.chromium.launch(
+                headless=True, args=["--no-sandbox", "--disable-dev-shm-usage"]
+            )
+
+        log(f"Starting {len(chunks)} pages, {in_flight} widget calls in flight")
+        tasks = [
+            asyncio.create_task(run_page(i + 1, browser, chunk, writer),
+                                name=f"page-{i + 1}")
+            for i, chunk in enumerate(chunks)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # On Ctrl-C every page closes its context before we go
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await browser.close()
+
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(
+        description="price configs with many pages on one asyncio loop")
+    parser.add_argument("--job", metavar="TOML",
+                        help="price the option sets of a job spec (jobs.py)")
+    parser.add_argument("--pages", "--workers", dest="pages", type=int,
+                        default=8, help="pages (browser contexts) at once")
+    parser.add_argument("--in-flight", type=int, default=4,
+                        help="page loads / price clicks at once across pages")
+    parser.add_argument("--price-timeout", type=float, default=30.0,
+                        help="seconds before a price click is abandoned")
+    parser.add_argument("--browser-endpoint",
+                        default=os.environ.get(ENDPOINT_ENV),
+                        help="attach to browser_server.py instead of launching")
+    parser.add_argument("--capture-xhr", action="store_true",
+                        help="read prices from the pricing XHR, DOM as fallback")
+    parser.add_argument("--price-url", default=None,
+                        help="regex matching the pricing XHR url")
+    parser.add_argument("--no-selection-cache", action="store_true")
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--txt-output", default=None,
+                        help="also write the legacy qty;;price text file")
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--max-configs", type=int, default=None)
+    parser.add_argument("--no-block-assets", action="store_true")
+    parser.add_argument("--allow-host", action="append", default=[])
+    parser.add_argument("--instrument", action="store_true",
+                        help="per-step latency histograms (kill -USR1 to dump)")
+    args = parser.parse_args()
+
+    global PRICE_TIMEOUT
+    PRICE_TIMEOUT = args.price_timeout
+    if args.job:
+        scrapper.use_job(args.job)
+    if args.url:
+        scrapper.URL = args.url
+    if args.instrument:
+        enable_instrumentation(log)
+    scrapper.CAPTURE_XHR = args.capture_xhr
+    scrapper.SELECTION_CACHE = not args.no_selection_cache
+    if args.price_url:
+        scrapper.PRICE_URL = re.compile(args.price_url, re.IGNORECASE)
+    scrapper.REQUEST_FILTER = RequestFilter(
+        scrapper.URL,
+        allow_hosts=ALLOW_HOSTS + tuple(args.allow_host),
+        block=not args.no_block_assets,
+    )
+
+    journal = scrapper.JOURNAL = ProgressJournal(args.journal)
+    log(f"Journal: {journal.summary()}")
+    configs = [
+        cfg for cfg in scrapper.build_configs()
+        if not journal.config_done(cfg, scrapper.QUANTITIES)
+    ]
+    if args.max_configs is not None:
+        configs = configs[:args.max_configs]
+    log(f"{len(configs)} configs left to price")
+    if not configs:
+        journal.close()
+        log("DONE ✔ Nothing left to price")
+        return
+
+    store = PriceStore(args.store, journal=journal)
+    writer = scrapper.output_for(store, args.txt_output)
+    pages = max(1, min(args.pages, len(configs)))
+    try:
+        asyncio.run(run(configs, writer, pages, max(1, args.in_flight),
+                        args.browser_endpoint))
+    except KeyboardInterrupt:
+        log("Interrupted, pages closed")
+    finally:
+        store.close()
+        journal.close()
+        scrapper.REQUEST_FILTER.close()
+        if args.instrument:
+            dump_step_timings(log)
+
+    log(f"Price sources: {PRICE_SOURCES.summary()}")
+    log(f"Selection cache: {cache_summary()}")
+    log(f"Request filter: {scrapper.REQUEST_FILTER.summary()}")
+    log(f"Journal: {journal.summary()}")
+    log(f"Recoveries: {RECOVERIES.summary()}")
+    for row in WAIT_TIMES.summary():
+        log(f"WAIT {row}")
+    log(f"DONE ✔ {store.rows_written} rows written to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
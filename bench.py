@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixture_server import (
+    WIDGET_DEFAULTS,
+    fixture_price,
+    fixture_url,
+    start_fixture_server,
+)
+from price_store import OPTION_COLUMNS, connect
+from shard_merge import merge_stores
+
+# =====================================================
+# SCRAPER BENCHMARK AGAINST THE MOCK WIDGET
+# =====================================================
+# Runs a scraper build (any scrapper.py that has --url, --max-configs
+# and --instrument) against fixture_server.py's mock widget and reports
+# configs/minute, p95 step latency and retry rates, and checks every
+# stored price against the fixture's price function. Everything is
+# local, so two builds can be compared run for run.
+#
+#     python bench.py --configs 4 --latency-ms 40 --jitter-ms 20
+#     python bench.py --scraper ../old/scrapper.py --json old.json -- --capture-xhr
+#     python bench.py --scraper async_engine.py --workers 16 -- --in-flight 4
+#     python bench.py --shards 3 --configs 2   # 3 x --shard i/3, merged
+
+STEP_ROW = re.compile(
+    r"^\[LOG\] (?P<name>\S+): n=(?P<n>\d+) p50=(?P<p50>\d+)ms "
+    r"p95=(?P<p95>\d+)ms p99=(?P<p99>\d+)ms max=(?P<max>\d+)ms "
+    r"attempts/call=(?P<attempts>[\d.]+) retried=(?P<retried>\d+) "
+    r"errors=(?P<errors>\d+)$"
+)
+
+RECOVERY_ROW = re.compile(r"Recovered in (?P<seconds>[\d.]+)s \((?P<method>\w+)")
+
+
+def parse_recoveries(lines):
+    # {method: [seconds]} from the scraper's "Recovered in" lines
+    found = {}
+    for line in lines:
+        m = RECOVERY_ROW.search(line)
+        if m:
+            found.setdefault(m["method"], []).append(float(m["seconds"]))
+    return found
+
+
+def parse_step_rows(lines):
+    # Top-level rows of instrument.dump(); the last dump wins
+    steps = {}
+    for line in lines:
+        m = STEP_ROW.match(line)
+        if m:
+            row = {k: float(v) if k == "attempts" else int(v)
+                   for k, v in m.groupdict().items() if k != "name"}
+            steps[m["name"]] = row
+    return steps
+
+
+def check_store(path):
+    # (configs, prices, errors, wrong prices) for the run's store
+    conn = connect(path)
+    try:
+        cols = ", ".join(OPTION_COLUMNS)
+        configs = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT DISTINCT {cols} FROM prices)"
+        ).fetchone()[0]
+        errors = conn.execute("SELECT COUNT(*) FROM scrape_errors").fetchone()[0]
+
+        prices = wrong = 0
+        for row in conn.execute(f"SELECT {cols}, qty, price FROM prices"):
+            prices += 1
+            if abs(fixture_price(*row[:-1]) - 10 - row[-1]) > 0.005:
+                wrong += 1
+        return configs, prices, errors, wrong
+    finally:
+        conn.close()
+
+
+def run_bench(scraper, configs, workers, extra_args, widget_options,
+              verbose=False, shards=1):
+    # configs is per shard; with shards > 1 every shard is its own
+    # process with --shard i/N and the stores are merged afterwards
+    server = start_fixture_server(**widget_options)
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    store = os.path.join(tmp, "prices.sqlite3")
+
+    def command(name, shard_args):
+        return [
+            sys.executable, os.path.abspath(scraper),
+            "--url", fixture_url(server) + "/",
+            "--store", os.path.join(tmp, f"{name}.sqlite3"),
+            "--journal", os.path.join(tmp, f"{name}.journal"),
+            "--max-configs", str(configs),
+            "--workers", str(workers),
+            "--instrument",
+        ] + shard_args + extra_args
+
+    if shards == 1:
+        cmds = [command("prices", [])]
+    else:
+        cmds = [
+            command(f"shard-{i}", ["--shard", f"{i}/{shards}",
+                                   "--cdp-port", str(9300 + 10 * i)])
+            for i in range(1, shards + 1)
+        ]
+
+    started = time.perf_counter()
+    procs = []
+    for i, cmd in enumerate(cmds):
+        out = open(os.path.join(tmp, f"output-{i}.log"), "w+",
+                   encoding="utf-8")
+        procs.append((subprocess.Popen(cmd, cwd=tmp, stdout=out,
+                                       stderr=subprocess.STDOUT, text=True),
+                      out))
+    lines = []
+    for proc, out in procs:
+        proc.wait()
+        out.seek(0)
+        for line in out:
+            line = line.rstrip("\n")
+            lines.append(line)
+            if verbose:
+                print(line, flush=True)
+        out.close()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    exit_code = max(proc.returncode for proc, _ in procs)
+
+    if shards > 1:
+        merge_stores([os.path.join(tmp, f"shard-{i}.sqlite3")
+                      for i in range(1, shards + 1)], store,
+                     log=lines.append)
+
+    priced, prices, errors, wrong = check_store(store)
+    steps = parse_step_rows(lines)
+    return {
+        "scraper": scraper,
+        "args": extra_args,
+        "shards": shards,
+        "widget": widget_options,
+        "exit_code": exit_code,
+        "seconds": round(elapsed, 2),
+        "configs": priced,
+        "prices": prices,
+        "errors": errors,
+        "wrong_prices": wrong,
+        "configs_per_min": round(priced / elapsed * 60, 2),
+        "prices_per_min": round(prices / elapsed * 60, 1),
+        "reloads": sum("Reloading page" in line for line in lines),
+        "aimd": {
+            verdict: sum(f"AIMD {verdict}:" in line for line in lines)
+            for verdict in ("back off", "speed up", "hold")
+        },
+        "recoveries": {
+            method: {"n": len(times), "avg_s": round(sum(times) / len(times), 2)}
+            for method, times in parse_recoveries(lines).items()
+        },
+        "selections_served": server.counters["selections"],
+        "page_loads": server.counters["page_loads"],
+        "steps": {
+            name: {
+                "n": row["n"],
+                "p95_ms": row["p95"],
+                "retry_rate": round(row["retried"] / row["n"], 4) if row["n"] else 0,
+                "errors": row["errors"],
+            }
+            for name, row in steps.items()
+        },
+        "tail": lines[-20:] if exit_code else [],
+    }
+
+
+def report(result):
+    print("=" * 60)
+    print(f"{result['scraper']} {' '.join(result['args'])}".rstrip()
+          + (f" ({result['shards']} shards)" if result["shards"] > 1 else ""))
+    print(f"widget: {', '.join(f'{k}={v}' for k, v in result['widget'].items())}")
+    if result["exit_code"]:
+        print(f"scraper exited with {result['exit_code']}:")
+        for line in result["tail"]:
+            print(f"  {line}")
+    print(f"{result['configs']} configs, {result['prices']} prices in "
+          f"{result['seconds']:.1f}s → {result['configs_per_min']:.2f} configs/min, "
+          f"{result['prices_per_min']:.0f} prices/min")
+    print(f"errors={result['errors']} wrong_prices={result['wrong_prices']} "
+          f"reloads={result['reloads']} page_loads={result['page_loads']} "
+          f"selections_served={result['selections_served']}")
+    if any(result["aimd"].values()):
+        print("aimd: " + ", ".join(f"{verdict}={n}"
+                                   for verdict, n in result["aimd"].items()))
+    for method, row in sorted(result["recoveries"].items()):
+        print(f"  recovery {method:<15} n={row['n']:<6} avg={row['avg_s']:.2f}s")
+    for name, row in sorted(result["steps"].items()):
+        print(f"  {name:<24} n={row['n']:<6} p95={row['p95_ms']}ms "
+              f"retry_rate={row['retry_rate']:.2%} errors={row['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="benchmark a scraper build against the mock widget; "
+                    "arguments after -- go to the scraper")
+    parser.add_argument("--scraper", default="scrapper.py")
+    parser.add_argument("--configs", type=int, default=3,
+                        help="configs per scraper process")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=1,
+                        help="run this many --shard i/N processes and merge")
+    parser.add_argument("--json", metavar="PATH",
+                        help="also write the result as JSON")
+    parser.add_argument("--verbose", action="store_true",
+                        help="echo the scraper's output")
+    for name, default in WIDGET_DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default),
+                            default=default)
+    args, extra = parser.parse_known_args()
+    if extra[:1] == ["--"]:
+        extra = extra[1:]
+
+    widget_options = {name: getattr(args, name) for name in WIDGET_DEFAULTS}
+    result = run_bench(args.scraper, args.configs, args.workers, extra,
+                       widget_options, args.verbose, args.shards)
+    report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    sys.exit(1 if result["exit_code"] or result["wrong_prices"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+# =====================================================
+# SHARED BROWSER SERVER
+# =====================================================
+# A long-lived Playwright browser server (python -m playwright
+# launch-server), so scraper processes attach with connect() and only
+# open a context each instead of launching a browser per run. The
+# server's path is its engine, ws://127.0.0.1:9222/firefox, so a client
+# can tell whether an endpoint serves the browser it was written for,
+# and attaches with its own slow_mo. A supervisor loop checks the port
+# and restarts the server when it dies or stops answering (retrying
+# until a start succeeds); clients that lose the connection wait for it
+# to come back and attach again.
+#
+#     python browser_server.py --browser chromium --port 9222 &
+#     python scrapper.py --browser-endpoint ws://127.0.0.1:9222/chromium
+#
+#     python browser_server.py --browser firefox --port 9223 &
+#     BROWSER_ENDPOINT=ws://127.0.0.1:9223/firefox python A5P_ones_250GA_G_FC_100UB.py
+
+DEFAULT_PORT = 9222
+ENDPOINT_ENV = "BROWSER_ENDPOINT"
+
+ENGINES = ("chromium", "firefox", "webkit")
+
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+]
+
+
+def log(msg):
+    print(f"[LOG] {msg}", flush=True)
+
+
+def endpoint_for(engine, port, host="127.0.0.1"):
+    return f"ws://{host}:{port}/{engine}"
+
+
+def endpoint_engine(endpoint):
+    # "ws://127.0.0.1:9223/firefox" → "firefox"
+    return urlparse(endpoint).path.strip("/")
+
+
+def health(endpoint, timeout=2.0):
+    # True when the server's port accepts connections
+    url = urlparse(endpoint)
+    try:
+        with socket.create_connection((url.hostname, url.port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_healthy(endpoint, timeout=30.0, interval=0.25):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if health(endpoint):
+            return True
+        time.sleep(interval)
+    return False
+
+
+# =====================================================
+# SUPERVISOR
+# =====================================================
+class BrowserServer:
+    def __init__(self, engine="chromium", port=DEFAULT_PORT, executable=None,
+                 headful=False, check_interval=5.0, failures_before_restart=3):
+        self.engine = engine
+        self.port = port
+        self.endpoint = endpoint_for(engine, port)
+        self.executable = executable
+        self.headful = headful
+        self.check_interval = check_interval
+        self.failures_before_restart = failures_before_restart
+        self.proc = None
+        self.config = None
+        self.restarts = 0
+
+    def launch_options(self):
+        # launchServer options, see playwright launch-server --config
+        options = {"port": self.port, "wsPath": f"/{self.engine}",
+                   "headless": not self.headful}
+        if self.engine == "chromium":
+            options["args"] = CHROMIUM_ARGS
+        if self.executable:
+            options["executablePath"] = self.executable
+        return options
+
+    def start(self):
+        fd, self.config = tempfile.mkstemp(prefix="pq-browser-", suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.launch_options(), f)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "playwright", "launch-server",
+             "--browser", self.engine, "--config", self.config],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        if not wait_healthy(self.endpoint):
+            self.stop()
+            raise RuntimeError(f"{self.engine} did not come up on {self.endpoint}")
+        log(f"Browser server ({self.engine}) on {self.endpoint} "
+            f"(pid {self.proc.pid})")
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+        if self.config:
+            os.remove(self.config)
+            self.config = None
+
+    def restart(self, reason):
+        self.restarts += 1
+        log(f"Restarting browser server ({reason}), restart #{self.restarts}")
+        self.stop()
+        self.start()
+
+    def supervise(self):
+        failures = 0
+        while True:
+            time.sleep(self.check_interval)
+            if self.proc is None:
+                reason = "last start failed"
+            elif self.proc.poll() is not None:
+                reason = f"exited with {self.proc.returncode}"
+            elif not health(self.endpoint):
+                failures += 1
+                if failures < self.failures_before_restart:
+                    continue
+                reason = f"{failures} failed health checks"
+            else:
+                failures = 0
+                continue
+
+            failures = 0
+            try:
+                self.restart(reason)
+            except (OSError, RuntimeError) as e:
+                # Tried again on the next check
+                log(f"Browser server did not start: {e}")
+
+
+# =====================================================
+# CLIENT SIDE
+# =====================================================
+def connect(p, endpoint, wait=60.0, log=log, slow_mo=0):
+    # Attach to the server, waiting out a restart of it
+    if not wait_healthy(endpoint, timeout=wait):
+        raise RuntimeError(f"No browser server answering on {endpoint}")
+    engine = endpoint_engine(endpoint)
+    if engine not in ENGINES:
+        raise ValueError(f"{endpoint} is not a browser_server.py endpoint "
+                         f"(ws://host:port/<{'|'.join(ENGINES)}>)")
+    browser = getattr(p, engine).connect(endpoint, slow_mo=slow_mo)
+    log(f"Attached to browser server {endpoint}")
+    return browser
+
+
+def open_browser(p, endpoint, launch, wait=60.0, log=log, engine="chromium",
+                 slow_mo=0):
+    # Attach to the shared server when an endpoint for this engine is
+    # given, otherwise launch() a private browser as before. engine is
+    # what launch() starts. Returns (browser, shared).
+    if endpoint and endpoint_engine(endpoint) != engine:
+        log(f"Not attaching to {endpoint}: this script runs {engine}")
+        endpoint = None
+    if not endpoint:
+        return launch(), False
+    return connect(p, endpoint, wait, log, slow_mo), True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--browser", choices=ENGINES, default="chromium")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--executable", default=None,
+                        help="browser binary (default: Playwright's)")
+    parser.add_argument("--headful", action="store_true")
+    parser.add_argument("--check-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = BrowserServer(args.browser, args.port, args.executable,
+                           args.headful, args.check_interval)
+    server.start()
+    try:
+        server.supervise()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        log(f"Browser server stopped after {server.restarts} restarts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from readiness import wait_menu_ready, wait_widget_ready
+from widget_state import read_selections
+
+# =====================================================
+# WIDGET OPTION CATALOG
+# =====================================================
+# Crawls every .control-group menu once and keeps what it found in a
+# versioned JSON file:
+#
+#   controls      every dropdown with its options (text + data-value)
+#   dependencies  label → chosen option → later dropdowns whose option
+#                 list changed because of that choice
+#   resets        label → other dropdowns whose value changed when it was
+#                 selected
+#
+# The catalog is tied to a fingerprint of the widget's scripts. A run
+# loads the page once, and only re-crawls when the fingerprint moved;
+# otherwise configs are checked against the cached option lists and
+# anything the widget no longer offers is dropped before scraping.
+
+CATALOG_FILE = "widget_catalog.json"
+SCHEMA_VERSION = 1
+
+# Dropdowns with more options than this (page counts, quantities) are
+# read but not crawled as drivers of other dropdowns
+MAX_DRIVER_OPTIONS = 20
+
+READ_OPTIONS_JS = """
+group => Array.from(group.querySelectorAll('ul.dropdown-menu a.filter-option'),
+  a => ({
+    text: (a.textContent || '').trim(),
+    value: a.closest('li')?.getAttribute('data-value') ?? null,
+  }))
+"""
+
+
+def group_locator(page, label):
+    return page.locator(
+        f'.control-group:has(label.control-label:has-text("{label}"))'
+    ).first
+
+
+def read_options(page, label):
+    group = group_locator(page, label)
+    group.locator("a.dropdown-toggle.filter-button").click(force=True)
+    wait_menu_ready(group)
+    options = group.evaluate(READ_OPTIONS_JS)
+    page.keyboard.press("Escape")
+    return options
+
+
+def option_texts(options):
+    return [o["text"] for o in options]
+
+
+# =====================================================
+# BUNDLE FINGERPRINT
+# =====================================================
+class BundleWatcher:
+    # Attach before goto(): remembers the widget's scripts and their
+    # validators as they load
+    def __init__(self, page, relevant=None):
+        self.relevant = relevant
+        self.scripts = set()
+        page.on("response", self.seen)
+
+    def seen(self, response):
+        request = response.request
+        if request.resource_type != "script":
+            return
+        if self.relevant and not self.relevant(request.url):
+            return
+        headers = response.headers
+        self.scripts.add((
+            request.url,
+            headers.get("etag", ""),
+            headers.get("last-modified", ""),
+        ))
+
+    def fingerprint(self, labels):
+        digest = hashlib.sha256()
+        for entry in sorted(self.scripts):
+            digest.update("\t".join(entry).encode("utf-8") + b"\n")
+        digest.update("\n".join(labels).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+
+def same_site(page_url):
+    host = urlsplit(page_url).hostname or ""
+    site = host[4:] if host.startswith("www.") else host
+
+    def relevant(url):
+        h = urlsplit(url).hostname or ""
+        return h == site or h.endswith("." + site) or "printiq" in h
+    return relevant
+
+
+# =====================================================
+# CRAWL
+# =====================================================
+def crawl(page, select, log=print, max_driver_options=MAX_DRIVER_OPTIONS):
+    # select(page, label, text) makes a selection the scraper's way.
+    # Dependencies are first-order: one choice changed at a time from the
+    # state the page loaded with.
+    start = read_selections(page)
+    labels = list(start)
+    baseline = {label: read_options(page, label) for label in labels}
+    log(f"Catalog: {len(labels)} dropdowns, "
+        f"{sum(len(o) for o in baseline.values())} options")
+
+    dependencies = defaultdict(dict)
+    resets = defaultdict(set)
+
+    for i, label in enumerate(labels):
+        texts = option_texts(baseline[label])
+        if len(texts) > max_driver_options:
+            continue
+        for text in texts:
+            before = read_selections(page)
+            try:
+                select(page, label, text)
+            except Exception as e:
+                log(f"Catalog: could not select {text!r} in {label!r}: {e}")
+                continue
+            after = read_selections(page)
+            for other in labels:
+                if other != label and after.get(other) != before.get(other):
+                    resets[label].add(other)
+
+            changed = {}
+            for later in labels[i + 1:]:
+                options = read_options(page, later)
+                if option_texts(options) != option_texts(baseline[later]):
+                    changed[later] = options
+            if changed:
+                dependencies[label][text] = changed
+                log(f"Catalog: {label} = {text} changes "
+                    f"{', '.join(changed)}")
+
+        # Put the driver back so later dropdowns are crawled from the
+        # page's own starting state
+        if start[label] in texts:
+            select(page, label, start[label])
+
+    return {
+        "controls": [
+            {"label": label, "initial": start[label], "options": baseline[label]}
+            for label in labels
+        ],
+        "dependencies": dependencies,
+        "resets": {label: sorted(others) for label, others in resets.items()},
+    }
+
+
+# =====================================================
+# CATALOG FILE
+# =====================================================
+def load_catalog(path=CATALOG_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    if catalog.get("schema") != SCHEMA_VERSION:
+        return None
+    return catalog
+
+
+def save_catalog(catalog, path=CATALOG_FILE):
+    # Bumps the version when the option tree changed; the previous one
+    # is kept next to it as <name>.v<N>.json
+    previous = load_catalog(path)
+    version = 1
+    if previous:
+        version = previous["version"]
+        same = all(previous.get(k) == catalog[k]
+                   for k in ("controls", "dependencies", "resets"))
+        if not same:
+            root, ext = os.path.splitext(path)
+            os.replace(path, f"{root}.v{version}{ext}")
+            version += 1
+
+    catalog = dict(catalog, schema=SCHEMA_VERSION, version=version,
+                   crawled_at=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return catalog
+
+
+def refresh_catalog(page, url, select, path=CATALOG_FILE, force=False,
+                    relevant=None, log=print):
+    # Loads the widget, and re-crawls only if its bundle changed
+    watcher = BundleWatcher(page, relevant or same_site(url))
+    page.goto(url, timeout=60000)
+    wait_widget_ready(page)
+    fingerprint = watcher.fingerprint(list(read_selections(page)))
+
+    catalog = load_catalog(path)
+    if catalog and catalog["fingerprint"] == fingerprint and not force:
+        log(f"Catalog v{catalog['version']} is current ({fingerprint})")
+        return catalog
+
+    log(f"Widget bundle changed ({fingerprint}), crawling options"
+        if catalog else "No catalog yet, crawling options")
+    crawled = crawl(page, select, log)
+    crawled["fingerprint"] = fingerprint
+    crawled["url"] = url
+    catalog = save_catalog(crawled, path)
+    log(f"Catalog v{catalog['version']} written to {path}")
+    return catalog
+
+
+# =====================================================
+# PLANNING AGAINST THE CATALOG
+# =====================================================
+def available_options(catalog, choices):
+    # {label: set of option texts} given the choices made so far
+    # ({label: text}), following recorded dependencies
+    allowed = {
+        c["label"]: set(option_texts(c["options"])) for c in catalog["controls"]
+    }
+    for label in allowed:
+        chosen = choices.get(label)
+        changed = catalog["dependencies"].get(label, {}).get(chosen, {})
+        for later, options in changed.items():
+            allowed[later] = set(option_texts(options))
+    return allowed
+
+
+def invalid_choices(catalog, choices):
+    # [(label, text)] the widget would not offer; dropdowns the catalog
+    # doesn't know are not judged
+    allowed = available_options(catalog, choices)
+    return [
+        (label, text) for label, text in choices.items()
+        if label in allowed and text not in allowed[label]
+    ]
@@ -0,0 +1,125 @@
+import threading
+from collections import Counter, defaultdict
+
+from planner import RESETS
+
+# =====================================================
+# DROPDOWN DEPENDENCY MODEL
+# =====================================================
+# Which dropdowns a selection invalidates. Declared edges (planner.RESETS)
+# are trusted blindly: their targets are always re-applied, because the
+# widget can reset them without the label showing it. Every other edge is
+# learned: after each selection the engine reads all dropdown values in
+# one evaluate(), and any control that drifted from the config is
+# recorded as an edge from the selection that moved it and re-applied.
+# Controls that held their value are not touched again.
+
+
+class DependencyModel:
+    def __init__(self, declared=RESETS):
+        self.lock = threading.Lock()
+        self.declared = {label: set(targets) for label, targets in declared.items()}
+        self.learned = defaultdict(Counter)  # label → {target: times seen}
+        self.checks = 0
+        self.reapplied = 0
+
+    def forced(self, label):
+        return self.declared.get(label, set())
+
+    def order(self, labels):
+        # Widget order, except declared targets go after their source so
+        # they aren't selected only to be reset again
+        labels = list(labels)
+        for label, targets in self.declared.items():
+            for target in targets:
+                if label in labels and target in labels \
+                        and labels.index(target) < labels.index(label):
+                    labels.remove(target)
+                    labels.insert(labels.index(label) + 1, target)
+        return labels
+
+    def seed(self, edges):
+        # Edges seen elsewhere (catalog crawl); verified, not forced
+        with self.lock:
+            for label, targets in edges.items():
+                for target in targets:
+                    self.learned[label].setdefault(target, 0)
+
+    def observe(self, label, drifted, log=print):
+        # drifted: dropdowns that lost their value after selecting label
+        with self.lock:
+            self.checks += 1
+            self.reapplied += len(drifted)
+            for target in drifted:
+                new = target not in self.learned[label] \
+                    and target not in self.declared.get(label, ())
+                self.learned[label][target] += 1
+                if new:
+                    log(f"Dependency learned: {label} → {target}")
+
+    def edges(self):
+        with self.lock:
+            rows = []
+            for label in sorted(set(self.declared) | set(self.learned)):
+                targets = self.declared.get(label, set()) | set(self.learned[label])
+                for target in sorted(targets):
+                    kind = "declared" if target in self.declared.get(label, ()) \
+                        else "learned"
+                    rows.append(f"{label} → {target} ({kind}, seen "
+                                f"{self.learned[label][target]}x)")
+            return rows
+
+    def summary(self):
+        with self.lock:
+            return (f"{self.checks} selections verified, "
+                    f"{self.reapplied} drifted dropdowns re-applied")
+
+
+DEPENDENCIES = DependencyModel()
+
+
+def shows(on_screen, label, want):
+    # The loose match wait_selection() accepts; a dropdown missing from
+    # on_screen is not judged
+    return str(want).lower() in on_screen.get(label, str(want)).lower()
+
+
+class ChangePlan:
+    # The decisions of apply_changes, shared by scrapper.py and
+    # async_engine.py, which only do the selecting and reading: what to
+    # select next, and after each selection which dropdowns were reset
+    # (declared) or drifted (read back), and so are forgotten and redone.
+    def __init__(self, expected, changes, model=DEPENDENCIES, max_passes=3):
+        self.expected = expected  # {label: value} of the whole config
+        self.model = model
+        self.order = model.order(list(expected))
+        self.pending = list(changes)
+        self.applied = Counter()
+        self.max_passes = max_passes
+
+    def next(self):
+        label, value = self.pending.pop(0)
+        self.applied[label] += 1
+        if self.applied[label] > self.max_passes:
+            raise Exception(f'"{label}" keeps getting reset')
+        return label, value
+
+    def after(self, label, on_screen, log=print):
+        # on_screen: every dropdown's text after selecting label. Returns
+        # (labels to forget, [(label, value)] still right to remember).
+        forced = [r for r in self.model.forced(label) if r in self.expected]
+        queued = {l for l, _ in self.pending} | set(forced)
+        drifted, kept = [], []
+        for other, want in self.expected.items():
+            if other == label or other in queued:
+                continue
+            if shows(on_screen, other, want):
+                # Still right: keep it cached even if the widget rebuilt
+                kept.append((other, want))
+            else:
+                drifted.append(other)
+        self.model.observe(label, drifted, log)
+
+        redo = queued | set(drifted)
+        self.pending = [(l, self.expected[l]) for l in self.order if l in redo]
+        return forced + drifted, kept
@@ -0,0 +1,331 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from price_capture import PRICE_BUTTON, PRICE_URL_PATTERN, parse_price_payload
+from price_store import STORE_FILE, PriceStore
+from scrapper import (
+    OUTPUT_FILE,
+    QUANTITIES,
+    OutputFanout,
+    OutputWriter,
+    build_configs,
+    config_name,
+    log,
+    open_widget,
+    select_option,
+)
+
+TEMPLATE_FILE = "price_template.json"
+
+# Job field → dropdown label on the widget
+FIELD_LABELS = {
+    "cover_printing": "Cover Printing",
+    "cover_stock": "Cover Stock",
+    "laminate": "Cover Laminate (outside only)",
+    "internal_printing": "Internal/Text Pages Printing",
+    "internal_stock": "Internal/Text Pages Stock",
+    "pages": "Internal/Text Pages (pp) Excluding Cover",
+    "qty": "Quantity",
+}
+
+# Order in which body parameters are claimed while parameterising.
+# Short numeric values go last so they can't steal a stock id.
+CLAIM_ORDER = (
+    "internal_stock", "cover_stock", "laminate", "cover_printing",
+    "internal_printing", "pages", "qty",
+)
+
+DROP_HEADERS = {"content-length", "host", "connection", "accept-encoding"}
+
+
+# =====================================================
+# BODY HELPERS (form or JSON)
+# =====================================================
+def find_path(node, wanted, claimed, path=()):
+    if isinstance(node, dict):
+        items = node.items()
+    elif isinstance(node, list):
+        items = enumerate(node)
+    else:
+        if str(node) == wanted and path not in claimed:
+            return list(path)
+        return None
+
+    for key, child in items:
+        found = find_path(child, wanted, claimed, path + (key,))
+        if found is not None:
+            return found
+    return None
+
+
+def set_path(node, path, value):
+    for key in path[:-1]:
+        node = node[key]
+    node[path[-1]] = value
+
+
+def decode_body(post_data, content_type):
+    if "json" in content_type:
+        return "json", json.loads(post_data)
+    # Form bodies are kept as a dict of the last value per key
+    return "form", dict(parse_qsl(post_data, keep_blank_values=True))
+
+
+def encode_body(encoding, body):
+    if encoding == "json":
+        return json.dumps(body)
+    return urlencode(body)
+
+
+# =====================================================
+# RECORD TEMPLATE FROM ONE PLAYWRIGHT SESSION
+# =====================================================
+def read_option_values(page, label_text):
+    group = page.locator(
+        f'.control-group:has(label.control-label:has-text("{label_text}"))'
+    )
+    entries = group.locator("ul.dropdown-menu li[data-value]").evaluate_all(
+        """els => els.map(li => ({
+            value: li.getAttribute('data-value'),
+            text: (li.textContent || '').trim()
+        }))"""
+    )
+    return {e["text"]: e["value"] for e in entries if e["value"] is not None}
+
+
+def record_template(page, path=TEMPLATE_FILE):
+    cfg = build_configs()[0]
+    qty = QUANTITIES[0]
+    selected = dict(zip(FIELD_LABELS, [str(v) for v in cfg] + [str(qty)]))
+
+    open_widget(page)
+    select_option(page, FIELD_LABELS["pages"], selected["pages"])
+    select_option(page, FIELD_LABELS["qty"], selected["qty"])
+
+    values = {
+        field: read_option_values(page, label)
+        for field, label in FIELD_LABELS.items()
+    }
+
+    with page.expect_request(
+        lambda r: r.resource_type in ("xhr", "fetch")
+        and bool(PRICE_URL_PATTERN.search(r.url))
+    ) as info:
+        page.locator(PRICE_BUTTON).click(force=True)
+    request = info.value
+
+    headers = {
+        k: v for k, v in request.all_headers().items()
+        if k.lower() not in DROP_HEADERS and not k.startswith(":")
+    }
+    encoding, body = decode_body(
+        request.post_data or "", headers.get("content-type", "")
+    )
+
+    fields = {}
+    claimed = set()
+    for field in CLAIM_ORDER:
+        wire = values[field].get(selected[field], selected[field])
+        found = find_path(body, wire, claimed)
+        if found is None:
+            raise Exception(f'"{field}" ({wire}) not found in pricing request')
+        fields[field] = found
+        claimed.add(tuple(found))
+        log(f"Template: {field} → {'.'.join(map(str, found))}")
+
+    template = {
+        "method": request.method,
+        "url": request.url,
+        "headers": headers,
+        "encoding": encoding,
+        "body": body,
+        "fields": fields,
+        "values": values,
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(template, f, indent=2)
+
+    log(f"Template written to {path}")
+    return template
+
+
+def fixture_template(base_url):
+    from fixture_server import FIELDS, PRICE_PATH
+
+    return {
+        "method": "POST",
+        "url": base_url + PRICE_PATH,
+        "headers": {"content-type": "application/x-www-form-urlencoded"},
+        "encoding": "form",
+        "body": {name: "" for name in FIELDS.values()},
+        "fields": {field: [name] for field, name in FIELDS.items()},
+        "values": {},
+    }
+
+
+# =====================================================
+# POOLED HTTP CLIENT
+# =====================================================
+class PricingClient:
+    # One keep-alive connection per thread; the executor size bounds
+    # how many requests are in flight at once.
+    def __init__(self, template, timeout=30):
+        self.template = template
+        self.timeout = timeout
+        url = urlsplit(template["url"])
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.path = url.path + (f"?{url.query}" if url.query else "")
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            cls = (
+                http.client.HTTPSConnection if self.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            conn = cls(self.netloc, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def build_body(self, job):
+        t = self.template
+        body = json.loads(json.dumps(t["body"]))  # deep copy
+        for field, value in job.items():
+            wire = t["values"].get(field, {}).get(value, value)
+            set_path(body, t["fields"][field], wire)
+        return encode_body(t["encoding"], body)
+
+    def price(self, job, retries=3):
+        body = self.build_body(job).encode("utf-8")
+        headers = dict(self.template["headers"])
+        headers["Content-Length"] = str(len(body))
+
+        for attempt in range(1, retries + 1):
+            conn = self.connection()
+            try:
+                conn.request(self.template["method"], self.path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                if resp.status != 200:
+                    raise Exception(f"HTTP {resp.status}")
+                return parse_price_payload(json.loads(data))
+            except Exception:
+                # Drop the connection; the next attempt opens a fresh one
+                conn.close()
+                self.local.conn = None
+                if attempt == retries:
+                    raise
+
+
+# =====================================================
+# FAN-OUT ENGINE
+# =====================================================
+def job_for(cfg, qty):
+    return dict(zip(FIELD_LABELS, [str(v) for v in cfg] + [str(qty)]))
+
+
+def run_direct(template, writer, concurrency=16, chunk_configs=64):
+    client = PricingClient(template)
+    configs = build_configs()
+    started = time.perf_counter()
+    priced = errors = 0
+
+    def price_one(args):
+        cfg, qty = args
+        try:
+            return qty, client.price(job_for(cfg, qty))
+        except Exception as e:
+            log(f"DIRECT ERROR {config_name(*cfg)} qty={qty} ❌ {e}")
+            return qty, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for start in range(0, len(configs), chunk_configs):
+            chunk = configs[start:start + chunk_configs]
+            tasks = [(cfg, qty) for cfg in chunk for qty in QUANTITIES]
+            results = iter(pool.map(price_one, tasks))
+
+            for cfg in chunk:
+                config_results = []
+                for _ in QUANTITIES:
+                    qty, price = next(results)
+                    if price is None:
+                        errors += 1
+                        config_results.append((qty, None))
+                    else:
+                        priced += 1
+                        config_results.append((qty, price - 10))
+                writer.write_config(cfg, config_results)
+
+    elapsed = time.perf_counter() - started
+    rate = priced / elapsed * 60 if elapsed else 0
+    log(f"Direct engine: {priced} prices, {errors} errors in {elapsed:.1f}s "
+        f"({rate:.0f}/min)")
+    return priced, errors
+
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", action="store_true",
+                        help="record the pricing request template with a browser")
+    parser.add_argument("--template", default=TEMPLATE_FILE)
+    parser.add_argument("--fixture", action="store_true",
+                        help="price against the local fixture server")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--txt-output", nargs="?", const=OUTPUT_FILE,
+                        default=None,
+                        help="also write the legacy qty;;price text file")
+    args = parser.parse_args()
+
+    if args.record:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            log("Launching browser to record template")
+            browser = p.chromium.launch(
+                headless=True,
+                args=["--no-sandbox", "--disable-dev-shm-usage"]
+            )
+            record_template(browser.new_page(), args.template)
+            browser.close()
+        return
+
+    server = None
+    if args.fixture:
+        from fixture_server import fixture_url, start_fixture_server
+
+        server = start_fixture_server()
+        template = fixture_template(fixture_url(server))
+        log(f"Using fixture server at {fixture_url(server)}")
+    else:
+        with open(args.template, encoding="utf-8") as f:
+            template = json.load(f)
+
+    store = PriceStore(args.store)
+    writer = OutputFanout(
+        store,
+        OutputWriter(args.txt_output) if args.txt_output else None,
+    )
+    try:
+        run_direct(template, writer, args.concurrency)
+    finally:
+        store.close()
+        if server:
+            server.shutdown()
+
+    log(f"DONE ✔ {store.rows_written} rows written to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
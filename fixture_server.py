@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# =====================================================
+# LOCAL PRINTIQ STAND-IN
+# =====================================================
+# Serves a pricing endpoint shaped like the widget's, and a mock of the
+# widget page itself (fixture_widget.html), so the scraper engines can be
+# exercised and benchmarked without touching cmykonline.com.au.
+
+PRICE_PATH = "/api/price"
+SELECT_PATH = "/api/select"
+WIDGET_PATH = "/api/widget"
+
+WIDGET_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "fixture_widget.html")
+
+# Knobs for the mock widget (see --help)
+WIDGET_DEFAULTS = {
+    "latency_ms": 0,          # server delay on every select/price call
+    "jitter_ms": 0,           # plus uniform 0..jitter_ms
+    "menu_delay_ms": 0,       # dropdown items render this long after a click
+    "rebuild_rate": 0.0,      # chance any selection rebuilds the controls
+    "price_fail_rate": 0.0,   # chance a price call returns HTTP 500
+    "persist_state": 0,       # 1: selections survive reloads (sessionStorage)
+    "seed": 1,
+}
+
+SELECT = "Select ..."
+
+# label, job field, options; the first option is what the page loads with
+WIDGET_CONTROLS = [
+    {"label": "Finished Size (mm)", "field": None,
+     "options": ["A4 Portrait - 210x297", "A5 Portrait - 148x210"]},
+    {"label": "Cover Printing", "field": "cover_printing",
+     "options": ["Full Colour (CMYK) one side",
+                 "Full Colour (CMYK) two sides"]},
+    {"label": "Cover Stock", "field": "cover_stock",
+     "options": ["250gsm Gloss Artboard", "300gsm Silk Artboard"]},
+    {"label": "Cover Laminate (outside only)", "field": "laminate",
+     "options": [SELECT, "Gloss Laminate", "Matt Laminate"]},
+    {"label": "Internal/Text Pages Printing", "field": "internal_printing",
+     "options": [SELECT, "Full Colour (CMYK) two sides",
+                 "Black only two sides"],
+     "required": True, "reset_on_rebuild": True},
+    {"label": "Internal/Text Pages Stock", "field": "internal_stock",
+     "options": ["115gsm Gloss Artpaper", "100gsm Linen Uncoated Paper",
+                 "100gsm Recycled Uncoated Bond", "100gsm Uncoated Bond"],
+     "rebuilds": True},
+    {"label": "Internal/Text Pages (pp) Excluding Cover", "field": "pages",
+     "options": list(range(48, 302, 2))},
+    {"label": "Quantity", "field": "qty",
+     "options": [5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 90, 100, 110,
+                 120, 130, 140, 150, 160, 170, 180, 190, 200, 225, 250, 275,
+                 300]},
+]
+
+# Form field names the fixture expects, in job order
+FIELDS = {
+    "cover_printing": "CoverPrinting",
+    "cover_stock": "CoverStock",
+    "laminate": "CoverLaminate",
+    "internal_printing": "InternalPrinting",
+    "internal_stock": "InternalStock",
+    "pages": "Pages",
+    "qty": "Quantity",
+}
+
+
+def stable_factor(text, low, high):
+    # Same input → same factor on every machine and every run
+    h = zlib.crc32(text.encode("utf-8")) % 1000 / 1000
+    return low + (high - low) * h
+
+
+def fixture_price(cover_printing, cover_stock, laminate, internal_printing,
+                  internal_stock, pages, qty):
+    pages = int(pages)
+    qty = int(qty)
+
+    setup = 180 * stable_factor(cover_printing + cover_stock, 0.9, 1.3)
+    if laminate and laminate != "Select ...":
+        setup += 45 * stable_factor(laminate, 0.8, 1.2)
+
+    sheet = 0.018 * stable_factor(internal_stock, 0.8, 1.6)
+    if "Black" in internal_printing:
+        sheet *= 0.55
+
+    # Spine/signature step every 16pp, like the live curve shows
+    per_copy = pages * sheet + (pages // 16) * 0.09 + 1.2
+    return round(setup + per_copy * qty ** 0.93, 2)
+
+
+# =====================================================
+# HTTP HANDLER
+# =====================================================
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def delay(self):
+        opts = self.server.widget_options
+        if opts["latency_ms"] or opts["jitter_ms"]:
+            with self.server.lock:
+                jitter = self.server.rng.uniform(0, opts["jitter_ms"])
+            time.sleep((opts["latency_ms"] + jitter) / 1000)
+
+    def count(self, name):
+        with self.server.lock:
+            self.server.counters[name] += 1
+
+    def read_params(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(raw or "{}")
+        return dict(parse_qsl(raw))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path in ("/", "/widget"):
+            with open(WIDGET_HTML, "rb") as f:
+                self.send_body(200, f.read(), "text/html; charset=utf-8")
+        elif path == WIDGET_PATH:
+            self.delay()
+            self.send_json(200, {
+                "controls": [
+                    {
+                        "label": c["label"],
+                        "field": FIELDS.get(c["field"]),
+                        "options": c["options"],
+                        "initial": str(c["options"][0]),
+                        "placeholder": SELECT,
+                        "required": c.get("required", False),
+                        "rebuilds": c.get("rebuilds", False),
+                        "reset_on_rebuild": c.get("reset_on_rebuild", False),
+                    }
+                    for c in WIDGET_CONTROLS
+                ],
+                "options": self.server.widget_options,
+                "price_path": PRICE_PATH,
+            })
+            self.count("page_loads")
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == SELECT_PATH:
+            self.read_params()
+            self.delay()
+            self.count("selections")
+            self.send_json(200, {"success": True})
+            return
+        if path != PRICE_PATH:
+            self.send_json(404, {"error": "not found"})
+            return
+
+        params = self.read_params()
+        self.delay()
+        try:
+            values = [params[name] for name in FIELDS.values()]
+            price = fixture_price(*values)
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+            return
+
+        with self.server.lock:
+            failed = self.server.rng.random() < self.server.widget_options[
+                "price_fail_rate"]
+        if failed:
+            self.count("price_failures")
+            self.send_json(500, {"success": False, "error": "injected failure"})
+            return
+
+        self.server.requests_served += 1
+        self.send_json(200, {"success": True, "data": {"TotalPrice": price}})
+
+
+# =====================================================
+# START / STOP
+# =====================================================
+def make_server(host, port, **widget_options):
+    unknown = set(widget_options) - set(WIDGET_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown widget options: {', '.join(sorted(unknown))}")
+
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    server.requests_served = 0
+    server.widget_options = dict(WIDGET_DEFAULTS, **widget_options)
+    server.rng = random.Random(server.widget_options["seed"])
+    server.lock = threading.Lock()
+    server.counters = Counter()
+    return server
+
+
+def start_fixture_server(host="127.0.0.1", port=0, **widget_options):
+    server = make_server(host, port, **widget_options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def fixture_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for name, default in WIDGET_DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default),
+                            default=default)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, **{
+        name: getattr(args, name) for name in WIDGET_DEFAULTS
+    })
+    print(f"[LOG] Fixture server on http://{args.host}:{args.port} "
+          f"(widget at /)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import glob
+import os
+import time
+from collections import defaultdict
+
+import scrapper
+from journal import ProgressJournal
+from price_store import KEY_COLUMNS, STORE_FILE, PriceStore, connect
+from scrapper import log
+
+# =====================================================
+# IMPORT LEGACY qty;;price FILES INTO THE PRICE STORE
+# =====================================================
+# Files look like:
+#
+#     A5P_ones_250GA_G_FC_100LUP_pp162
+#     5;;474.38
+#     10;;ERROR
+#     CONFIG ERROR
+#
+# Each header is decoded back into option labels with the code maps the
+# scripts used to build it. Files are read line by line and rows go
+# straight into the store's bounded writer queue, which blocks the parser
+# while the writer catches up, so memory stays flat however many files
+# are loaded.
+
+DEFAULT_FILES = ["A5P_*.txt", "A5_PERFECT_BOUND_OUTPUT.txt"]
+
+# Every page count the product offers (sc.py's PAGES)
+FULL_PAGES = list(range(48, 302, 2))
+
+# code → label, per option, collected from the scraper scripts
+OPTION_CODES = [
+    {"ones": "Full Colour (CMYK) one side"},
+    {"250GA": "250gsm Gloss Artboard"},
+    {"G": "Gloss Laminate"},
+    {"FC": "Full Colour (CMYK) two sides"},
+    {
+        "100GA": "115gsm Gloss Artpaper",
+        "100LUP": "100gsm Linen Uncoated Paper",
+        "100RUB": "100gsm Recycled Uncoated Bond",
+        "100UB": "100gsm Uncoated Bond",
+        "100LU": "100gsm Uncoated Bond",  # deep.py / scm1.py spelling
+    },
+]
+
+
+def decode_header(line):
+    # "A5P_ones_250GA_G_FC_100LUP_pp162" → option tuple, or None
+    parts = line.split("_")
+    if len(parts) != 7 or parts[0] != "A5P" or not parts[6].startswith("pp"):
+        return None
+    options = []
+    for codes, code in zip(OPTION_CODES, parts[1:6]):
+        if code not in codes:
+            raise ValueError(f"unknown option code {code!r} in {line!r}")
+        options.append(codes[code])
+    return tuple(options) + (int(parts[6][2:]),)
+
+
+def parse_file(path):
+    # Yields ("price", cfg, qty, price), ("error", cfg, qty, message) and
+    # ("unknown", None, None, header) records, one line at a time
+    cfg = None
+    with open(path, encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line:
+                continue
+
+            if line.startswith("A5P_"):
+                try:
+                    cfg = decode_header(line)
+                except ValueError:
+                    cfg = None
+                    yield "unknown", None, None, line
+                continue
+
+            if cfg is None:
+                continue
+
+            if line.startswith("CONFIG ERROR"):
+                yield "error", cfg, None, line
+                continue
+
+            qty, sep, value = line.partition(";;")
+            if not sep:
+                continue
+            try:
+                qty = int(qty)
+            except ValueError:
+                continue
+            try:
+                yield "price", cfg, qty, float(value)
+            except ValueError:
+                yield "error", cfg, qty, value
+
+
+# =====================================================
+# GAP REPORT
+# =====================================================
+def find_gaps(conn, prefixes=(), pages=FULL_PAGES, quantities=None):
+    # For every option prefix in the store, and every planned one in
+    # prefixes even without a single row: page counts with no prices at
+    # all, and page counts with some quantities missing
+    if quantities is None:
+        quantities = scrapper.QUANTITIES
+    have = defaultdict(lambda: defaultdict(set))
+    prefix_cols = KEY_COLUMNS[2:7]
+    for row in conn.execute(
+        f"SELECT DISTINCT {', '.join(prefix_cols)}, pages, qty FROM prices"
+    ):
+        have[row[:5]][row[5]].add(row[6])
+    for prefix in prefixes:
+        have.setdefault(tuple(prefix), {})
+
+    gaps = {}
+    wanted = set(quantities)
+    for prefix, by_pages in sorted(have.items()):
+        missing_pages = [pg for pg in pages if pg not in by_pages]
+        partial = {
+            pg: sorted(wanted - qtys)
+            for pg, qtys in sorted(by_pages.items())
+            if wanted - qtys
+        }
+        gaps[prefix] = (missing_pages, partial)
+    return gaps
+
+
+def format_ranges(values, step=2):
+    if not values:
+        return "-"
+    out = []
+    start = prev = values[0]
+    for v in values[1:]:
+        if v != prev + step:
+            out.append(f"{start}" if start == prev else f"{start}-{prev}")
+            start = v
+        prev = v
+    out.append(f"{start}" if start == prev else f"{start}-{prev}")
+    return ", ".join(out)
+
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES,
+                        help="files or glob patterns (default: A5P_*.txt ...)")
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--seed-journal", metavar="PATH",
+                        help="also mark imported prices done in this journal")
+    parser.add_argument("--job", metavar="TOML",
+                        help="planned option sets for the gap report "
+                             "(default: scrapper.py's)")
+    args = parser.parse_args()
+    if args.job:
+        scrapper.use_job(args.job)
+
+    paths = []
+    for pattern in args.files:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    journal = ProgressJournal(args.seed_journal) if args.seed_journal else None
+    # Journal lines are written by the store once their rows are committed
+    store = PriceStore(args.store, journal=journal)
+    counts = defaultdict(int)
+    started = time.perf_counter()
+
+    try:
+        for path in paths:
+            if not os.path.exists(path):
+                log(f"SKIP missing file {path}")
+                continue
+
+            # The file's mtime is the best scrape time we have
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%S",
+                                  time.gmtime(os.path.getmtime(path)))
+            for kind, cfg, qty, value in parse_file(path):
+                counts[kind] += 1
+                if kind == "price":
+                    store.add_price(cfg, qty, value, stamp)
+                    store.journal_when_committed(cfg, [(qty, value)])
+                elif kind == "error":
+                    store.add_error(cfg, qty, value, stamp)
+                else:
+                    log(f"Unknown header, block skipped: {value}")
+            log(f"Imported {path}")
+    finally:
+        store.close()
+        if journal:
+            journal.close()
+
+    log(f"{len(paths)} files, {counts['price']} prices, {counts['error']} errors, "
+        f"{counts['unknown']} unknown headers in "
+        f"{time.perf_counter() - started:.1f}s")
+
+    planned = {cfg[:-1] for cfg in scrapper.build_configs()}
+    conn = connect(args.store)
+    for prefix, (missing, partial) in find_gaps(conn, planned).items():
+        log("=" * 60)
+        log(f"GAPS {' | '.join(prefix)}")
+        log(f"  pages with no prices: {format_ranges(missing)}")
+        for pg, qtys in partial.items():
+            log(f"  pp{pg} missing qty: {', '.join(map(str, qtys))}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
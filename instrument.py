@@ -0,0 +1,193 @@
+import asyncio
+import contextvars
+import functools
+import math
+import signal
+import threading
+import time
+from collections import Counter
+
+# =====================================================
+# PER-STEP TIMING INSTRUMENTATION
+# =====================================================
+# Wraps the scraper steps, records wall time, attempts and outcome into
+# log-linear (HDR-style) histograms keyed by step and dropdown label.
+# Recording is two perf_counter() calls, a lock and a few integer ops.
+
+ENABLED = False
+
+SUB_BUCKETS = 32  # linear buckets per power of two: ~3% precision
+
+
+class Histogram:
+    # Values in microseconds. Bucket = (power of two, linear sub-bucket),
+    # so relative error is bounded across ns-to-minutes without storing
+    # every sample.
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(us):
+        # Exact below 2*SUB_BUCKETS, then SUB_BUCKETS steps per octave
+        exp = max(0, us.bit_length() - SUB_BUCKETS.bit_length())
+        return (exp, us >> exp)
+
+    @staticmethod
+    def bucket_value(key):
+        exp, sub = key
+        # Upper edge of the bucket, so percentiles never under-report
+        return ((sub + 1) << exp) - 1
+
+    def record(self, seconds):
+        us = max(0, int(seconds * 1_000_000))
+        self.counts[self.bucket(us)] += 1
+        self.total += 1
+        self.max = max(self.max, us)
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(self.bucket_value(key), self.max)
+        return self.max
+
+
+class StepStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.attempts = Counter()  # attempts per call → calls
+        self.outcomes = Counter()
+
+
+_lock = threading.Lock()
+_stats = {}
+# Per thread and per asyncio task, so concurrent steps don't share counts
+_attempts = contextvars.ContextVar("attempts", default=0)
+# fn(step, label, seconds, attempts, outcome) after every call,
+# histograms on or not; label is the dropdown (or None), attempts is 0
+# when the step never reached its retry loop (served from the selection
+# cache)
+_listeners = []
+
+
+def add_listener(fn):
+    _listeners.append(fn)
+
+
+def record(step, label, seconds, attempts, outcome):
+    with _lock:
+        for key in ((step, None), (step, label)) if label else ((step, None),):
+            stats = _stats.get(key)
+            if stats is None:
+                stats = _stats[key] = StepStats()
+            stats.latency.record(seconds)
+            stats.attempts[attempts] += 1
+            stats.outcomes[outcome] += 1
+
+
+def count_attempt():
+    # Called inside a step's retry loop
+    if ENABLED or _listeners:
+        _attempts.set(_attempts.get() + 1)
+
+
+def instrumented(step, label_arg=None):
+    # label_arg: index of the positional argument holding the dropdown
+    # label, to split the step's histogram per dropdown
+    def finish(args, started, outcome, token):
+        elapsed = time.perf_counter() - started
+        label = None
+        if label_arg is not None and len(args) > label_arg:
+            label = str(args[label_arg])
+        attempts = _attempts.get()
+        if ENABLED:
+            record(step, label, elapsed, max(1, attempts), outcome)
+        for listener in _listeners:
+            listener(step, label, elapsed, attempts, outcome)
+        _attempts.reset(token)
+
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def inner_async(*args, **kwargs):
+                if not (ENABLED or _listeners):
+                    return await fn(*args, **kwargs)
+                token = _attempts.set(0)
+                started = time.perf_counter()
+                outcome = "ok"
+                try:
+                    return await fn(*args, **kwargs)
+                except BaseException:
+                    outcome = "error"
+                    raise
+                finally:
+                    finish(args, started, outcome, token)
+            return inner_async
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not (ENABLED or _listeners):
+                return fn(*args, **kwargs)
+            token = _attempts.set(0)
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                outcome = "error"
+                raise
+            finally:
+                finish(args, started, outcome, token)
+        return inner
+    return wrap
+
+
+# =====================================================
+# REPORT
+# =====================================================
+def report_lines():
+    def ms(us):
+        return f"{us / 1000:.0f}ms"
+
+    with _lock:
+        items = sorted(_stats.items(), key=lambda kv: (kv[0][0], kv[0][1] or ""))
+        rows = []
+        for (step, label), s in items:
+            h = s.latency
+            calls = sum(s.attempts.values())
+            retried = calls - s.attempts.get(1, 0)
+            avg_attempts = sum(a * n for a, n in s.attempts.items()) / calls
+            name = step if label is None else f"  {step}[{label}]"
+            rows.append(
+                f"{name}: n={h.total} p50={ms(h.percentile(50))} "
+                f"p95={ms(h.percentile(95))} p99={ms(h.percentile(99))} "
+                f"max={ms(h.max)} attempts/call={avg_attempts:.2f} "
+                f"retried={retried} errors={s.outcomes.get('error', 0)}"
+            )
+    return rows
+
+
+def dump(log=print):
+    log("STEP TIMINGS")
+    for row in report_lines():
+        log(row)
+
+
+def enable(log=print):
+    global ENABLED
+    ENABLED = True
+    # kill -USR1 <pid> prints the histograms mid-run. The handler runs on
+    # the main thread, which may be inside record() holding _lock, so
+    # the dump happens on a thread of its own.
+    def on_signal(*_):
+        threading.Thread(target=dump, args=(log,), name="step-timings",
+                         daemon=True).start()
+
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, on_signal)
@@ -0,0 +1,123 @@
+import random
+from bisect import bisect_right
+
+# =====================================================
+# QUANTITY-CURVE INTERPOLATION
+# =====================================================
+# Price rises smoothly with quantity for a fixed config, so only anchor
+# quantities are scraped. A monotone cubic (Fritsch-Carlson PCHIP) is fit
+# through them, a few skipped quantities are checked against the live
+# widget, and if any check misses the tolerance the config falls back to
+# a full scrape.
+
+DEFAULT_ANCHORS = [5, 10, 20, 30, 50, 80, 100, 150, 200, 250, 300]
+DEFAULT_SPOT_CHECKS = 2
+# Relative. Live curves wiggle about 1% around a smooth fit (median
+# error on the 100LUP/100RUB data), so 2% catches real step changes only.
+DEFAULT_TOLERANCE = 0.02
+
+
+def pchip_slopes(xs, ys):
+    n = len(xs)
+    h = [xs[i + 1] - xs[i] for i in range(n - 1)]
+    delta = [(ys[i + 1] - ys[i]) / h[i] for i in range(n - 1)]
+    if n == 2:
+        return [delta[0], delta[0]]
+
+    d = [0.0] * n
+    for k in range(1, n - 1):
+        if delta[k - 1] * delta[k] <= 0:
+            d[k] = 0.0
+        else:
+            w1 = 2 * h[k] + h[k - 1]
+            w2 = h[k] + 2 * h[k - 1]
+            d[k] = (w1 + w2) / (w1 / delta[k - 1] + w2 / delta[k])
+
+    # One-sided, shape-preserving end slopes
+    def end_slope(h0, h1, d0, d1):
+        slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        if slope * d0 <= 0:
+            return 0.0
+        if d0 * d1 <= 0 and abs(slope) > abs(3 * d0):
+            return 3 * d0
+        return slope
+
+    d[0] = end_slope(h[0], h[1], delta[0], delta[1])
+    d[-1] = end_slope(h[-1], h[-2], delta[-1], delta[-2])
+    return d
+
+
+class MonotoneCurve:
+    def __init__(self, points):
+        points = sorted(dict(points).items())
+        self.xs = [float(x) for x, _ in points]
+        self.ys = [float(y) for _, y in points]
+        self.ds = pchip_slopes(self.xs, self.ys)
+
+    def covers(self, x):
+        return self.xs[0] <= x <= self.xs[-1]
+
+    def __call__(self, x):
+        xs, ys, ds = self.xs, self.ys, self.ds
+        if not self.covers(x):
+            raise ValueError(f"{x} outside anchors {xs[0]:g}-{xs[-1]:g}")
+        i = min(bisect_right(xs, x) - 1, len(xs) - 2)
+        h = xs[i + 1] - xs[i]
+        t = (x - xs[i]) / h
+        h00 = 2 * t ** 3 - 3 * t ** 2 + 1
+        h10 = t ** 3 - 2 * t ** 2 + t
+        h01 = -2 * t ** 3 + 3 * t ** 2
+        h11 = t ** 3 - t ** 2
+        return h00 * ys[i] + h10 * h * ds[i] + h01 * ys[i + 1] + h11 * h * ds[i + 1]
+
+
+# =====================================================
+# ANCHOR → FIT → SPOT-CHECK → FALLBACK
+# =====================================================
+def price_with_interpolation(quantities, fetch, anchors=DEFAULT_ANCHORS,
+                             spot_checks=DEFAULT_SPOT_CHECKS,
+                             tolerance=DEFAULT_TOLERANCE, seed=None, log=print):
+    # fetch(qty) → price or None. Returns [(qty, price, source)] in
+    # quantity order, source being "scraped" or "interpolated".
+    quantities = sorted(quantities)
+    scraped = {}
+
+    def scrape(qty):
+        if qty not in scraped:
+            scraped[qty] = fetch(qty)
+        return scraped[qty]
+
+    for qty in quantities:
+        if qty in anchors:
+            scrape(qty)
+
+    points = [(q, p) for q, p in scraped.items() if p is not None]
+    skipped = [q for q in quantities if q not in scraped]
+
+    curve = MonotoneCurve(points) if len(points) >= 3 else None
+    if curve is None or not all(curve.covers(q) for q in skipped):
+        log("Interpolation: not enough anchors, full scrape")
+        skipped = []
+
+    # Spot-check a deterministic sample of the skipped quantities
+    rng = random.Random(seed)
+    for qty in rng.sample(skipped, min(spot_checks, len(skipped))):
+        predicted = curve(qty)
+        actual = scrape(qty)
+        if actual is None:
+            continue
+        error = abs(predicted - actual) / actual
+        log(f"Spot check qty={qty}: fit {predicted:.2f} vs live {actual:.2f} "
+            f"({error:.2%})")
+        if error > tolerance:
+            log("Interpolation: spot check out of tolerance, full scrape")
+            skipped = []
+            break
+
+    results = []
+    for qty in quantities:
+        if qty in skipped and qty not in scraped:
+            results.append((qty, round(curve(qty), 2), "interpolated"))
+        else:
+            results.append((qty, scrape(qty), "scraped"))
+    return results
@@ -0,0 +1,124 @@
+import os
+import threading
+
+from price_store import OPTION_COLUMNS
+
+# =====================================================
+# DECLARATIVE JOB SPECS
+# =====================================================
+# One TOML file lists the option sets per dropdown, and scrapper.py
+# --job prices all of their combinations in one browser session. The
+# planner's Gray-code walk means only the dropdowns that differ between
+# neighbouring configs are touched, so the shared prefix (size, cover,
+# laminate, internal printing) is selected once instead of once per
+# script. This replaces one copy-pasted A5P_*.py per internal stock; see
+# jobs/a5p_ones_250GA_G_FC.toml.
+
+# Option columns except pages, in CONFIG_LABELS order
+SPEC_OPTIONS = OPTION_COLUMNS[:-1]
+
+
+class JobSpec:
+    def __init__(self, data, path=None):
+        self.path = path
+        self.name = data.get("name") or os.path.basename(path or "job")
+
+        options = data.get("options", {})
+        missing = [c for c in SPEC_OPTIONS if not options.get(c)]
+        if missing:
+            raise ValueError(f"job spec needs options for: {', '.join(missing)}")
+        # [{label: code}] in column order, like scrapper.COVER_PRINTING etc.
+        self.options = [dict(options[c]) for c in SPEC_OPTIONS]
+
+        pages = data.get("pages", {})
+        self.page_start = int(pages.get("start", 48))
+        self.page_stop = int(pages.get("stop", 300))
+        self.page_step = int(pages.get("step", 2))
+        # start_by_<column> = {label: first page count} per option value
+        self.page_starts = {}
+        for key, table in pages.items():
+            if key.startswith("start_by_"):
+                column = key[len("start_by_"):]
+                if column not in SPEC_OPTIONS:
+                    raise ValueError(f"unknown option in pages.{key}")
+                self.page_starts[SPEC_OPTIONS.index(column)] = {
+                    label: int(start) for label, start in table.items()
+                }
+
+        self.quantities = [int(q) for q in data.get("quantities", [])] or None
+        self.txt_output = data.get("txt_output")
+
+    @property
+    def pages(self):
+        # Every page count any config may use
+        low = min([self.page_start] + [
+            start for table in self.page_starts.values()
+            for start in table.values()
+        ])
+        return list(range(low, self.page_stop + 1, self.page_step))
+
+    def allows(self, cfg):
+        *options, pg = cfg
+        start = self.page_start
+        for index, table in self.page_starts.items():
+            start = table.get(options[index], start)
+        return start <= pg <= self.page_stop
+
+    def txt_path(self, cfg):
+        codes = {
+            column: self.options[i][value]
+            for i, (column, value) in enumerate(zip(SPEC_OPTIONS, cfg))
+        }
+        return self.txt_output.format(**codes)
+
+
+def load_job(path):
+    # Imported here: scrapper.py, shard_merge.py and price_store.py import
+    # this module on every run, and tomli is only needed on Python < 3.11
+    # when a job is actually loaded
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        import tomli as tomllib
+
+    with open(path, "rb") as f:
+        return JobSpec(tomllib.load(f), path)
+
+
+# =====================================================
+# OUTPUT + REPORT
+# =====================================================
+class JobTxtWriter:
+    # Legacy qty;;price files split the way the per-stock scripts wrote
+    # them: txt_output is formatted with the option codes of each config
+    def __init__(self, job, writer_class):
+        self.job = job
+        self.writer_class = writer_class
+        self.writers = {}
+        self.lock = threading.Lock()
+
+    def write_config(self, cfg, results, error=None):
+        path = self.job.txt_path(cfg)
+        with self.lock:
+            writer = self.writers.get(path)
+            if writer is None:
+                writer = self.writers[path] = self.writer_class(path)
+        writer.write_config(cfg, results, error)
+
+
+def savings_summary(configs, launch_seconds, setup_times, switch_times):
+    # One script per option prefix would launch a browser and set the
+    # whole prefix up once each; one session pays that once plus the
+    # prefix switches between them
+    variants = len({cfg[:-1] for cfg in configs})
+    if not setup_times:
+        return f"{variants} variants, no setup measured"
+    setup = sum(setup_times) / len(setup_times)
+    per_script = variants * (launch_seconds + setup)
+    one_session = launch_seconds + sum(setup_times) + sum(switch_times)
+    return (
+        f"{variants} variants in one session: launch {launch_seconds:.1f}s + "
+        f"setup {setup:.1f}s paid once, {len(switch_times)} prefix switches "
+        f"{sum(switch_times):.1f}s → ~{per_script - one_session:.1f}s saved vs "
+        f"one script per variant"
+    )
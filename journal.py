@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+import zlib
+
+# =====================================================
+# APPEND-ONLY PROGRESS JOURNAL
+# =====================================================
+# One line per priced (option tuple, qty):
+#
+#     <crc32 hex>\t<cover printing>\x1f...\x1f<pages>\x1f<qty>\t<price>\n
+#
+# A killed run leaves at most a torn last line; its checksum fails and it
+# is ignored on load, and the next run ends it before appending. Lines are fsync'ed in batches, so a crash loses at
+# most `fsync_every` entries or `fsync_interval` seconds of progress,
+# which are simply priced again.
+
+JOURNAL_FILE = "scrape_progress.journal"
+
+SEP = "\x1f"
+
+
+def journal_key(cfg, qty):
+    return SEP.join(str(v) for v in cfg) + SEP + str(qty)
+
+
+def encode_line(key, price):
+    body = f"{key}\t{price}"
+    crc = zlib.crc32(body.encode("utf-8"))
+    return f"{crc:08x}\t{body}\n".encode("utf-8")
+
+
+def load_keys(path):
+    # Keys are kept as raw strings: a set of millions of short strings
+    # loads in seconds, without splitting every line into a tuple
+    done = set()
+    bad = 0
+    if not os.path.exists(path):
+        return done, bad
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    for line in data.split(b"\n"):
+        if not line:
+            continue
+        crc, _, body = line.partition(b"\t")
+        try:
+            if int(crc, 16) != zlib.crc32(body):
+                bad += 1
+                continue
+        except ValueError:
+            bad += 1
+            continue
+        key = body.rpartition(b"\t")[0]
+        done.add(key.decode("utf-8"))
+    return done, bad
+
+
+def ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class ProgressJournal:
+    def __init__(self, path=JOURNAL_FILE, fsync_every=50, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+
+        started = time.perf_counter()
+        self.done, bad = load_keys(path)
+        self.loaded = len(self.done)
+        self.load_seconds = time.perf_counter() - started
+        self.skipped_lines = bad
+
+        self.file = open(path, "ab")
+        if self.file.tell() and not ends_with_newline(path):
+            # Finish the torn line, or the first new entry would share it
+            self.file.write(b"\n")
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def is_done(self, cfg, qty):
+        return journal_key(cfg, qty) in self.done
+
+    def config_done(self, cfg, quantities):
+        return all(self.is_done(cfg, qty) for qty in quantities)
+
+    def record(self, cfg, qty, price):
+        key = journal_key(cfg, qty)
+        with self.lock:
+            self.file.write(encode_line(key, f"{price:.2f}"))
+            self.done.add(key)
+            self.pending += 1
+            if (self.pending >= self.fsync_every
+                    or time.monotonic() - self.last_sync >= self.fsync_interval):
+                self.sync_locked()
+
+    def sync_locked(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        with self.lock:
+            self.sync_locked()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self.sync_locked()
+            self.file.close()
+
+    def summary(self):
+        return (
+            f"{self.loaded} entries loaded in {self.load_seconds:.2f}s"
+            f" ({self.skipped_lines} torn lines ignored), {len(self.done)} now"
+        )
@@ -0,0 +1,144 @@
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# =====================================================
+# AIMD CONCURRENCY + PACING CONTROLLER (--aimd)
+# =====================================================
+# Instead of a hand-tuned slow_mo and fixed pauses, the pace follows what
+# the site does. The controller listens to the instrumented widget steps
+# (instrument.add_listener) and judges every WINDOW round trips:
+#
+#   congested  error or retry rate over the limit, or a step's median
+#              latency over LATENCY_FACTOR x its baseline
+#              → halve the workers allowed at the widget, double the pause
+#   healthy    → take one PACE_STEP_MS off the pause; with no pause left,
+#              allow one more worker (up to --workers)
+#
+# Latency is judged per step and dropdown: a Quantity pick and a prefix
+# switch's Internal Stock select take very different times. A step's
+# baseline is the best window median seen for it, drifting back up by
+# BASELINE_DRIFT per window, so one lucky fast window can't set a floor
+# the site never meets again.
+#
+# Workers over the limit wait before their next quantity or prefix
+# switch; the pause is slept before every dropdown or price click. Each
+# decision is logged as an "AIMD" line, so runs can be compared.
+
+# Steps that make a widget round trip
+STEPS = ("select_option", "force_internal_printing", "get_price")
+
+WINDOW = 20
+MAX_ERROR_RATE = 0.05
+MAX_RETRY_RATE = 0.20
+LATENCY_FACTOR = 2.0
+BASELINE_DRIFT = 1.1
+PACE_STEP_MS = 50
+MAX_PACE_MS = 2000
+
+
+class AIMDController:
+    def __init__(self, max_workers, window=WINDOW, log=print):
+        self.max_workers = max(1, max_workers)
+        self.limit = max(1, self.max_workers // 2)
+        self.pace_ms = 0
+        self.window = window
+        self.log = log
+        self.cond = threading.Condition()
+        self.active = 0
+        self.samples = []
+        self.baseline = {}  # (step, label) → drifting best median (seconds)
+        self.decisions = Counter()
+        self.lowest = self.highest = self.limit
+        # Pause slept by this thread since its last observed step; it is
+        # taken out of the latency, or the controller would read its own
+        # back-off as the site slowing down
+        self.local = threading.local()
+
+    @contextmanager
+    def slot(self):
+        # One worker's turn at the widget; blocks while over the limit
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    def pace(self):
+        if self.pace_ms:
+            pause = self.pace_ms / 1000
+            time.sleep(pause)
+            self.local.paused = getattr(self.local, "paused", 0.0) + pause
+
+    # instrument listener, any worker thread
+    def observe(self, step, label, seconds, attempts, outcome):
+        paused = getattr(self.local, "paused", 0.0)
+        self.local.paused = 0.0
+        if step not in STEPS or attempts == 0:
+            return  # 0: answered from the selection cache
+        seconds = max(0.0, seconds - paused)
+        with self.cond:
+            self.samples.append(((step, label), seconds, attempts, outcome))
+            if len(self.samples) < self.window:
+                return
+            samples, self.samples = self.samples, []
+            line = self.decide(samples)
+            self.cond.notify_all()
+        self.log(line)
+
+    def decide(self, samples):
+        n = len(samples)
+        errors = sum(outcome != "ok" for *_, outcome in samples) / n
+        retries = sum(attempts > 1 for _, _, attempts, _ in samples) / n
+
+        times = defaultdict(list)
+        for key, seconds, *_ in samples:
+            times[key].append(seconds)
+        slow = []
+        for key, values in sorted(times.items(), key=lambda kv: str(kv[0])):
+            median = statistics.median(values)
+            best = self.baseline.get(key, median)
+            if median > best * LATENCY_FACTOR:
+                step, label = key
+                name = step if label is None else f"{step}[{label}]"
+                slow.append(f"{name} {median * 1000:.0f}ms vs "
+                            f"{best * 1000:.0f}ms")
+            self.baseline[key] = min(median, best * BASELINE_DRIFT)
+
+        old_limit, old_pace = self.limit, self.pace_ms
+        if errors > MAX_ERROR_RATE or retries > MAX_RETRY_RATE or slow:
+            verdict = "back off"
+            self.limit = max(1, self.limit // 2)
+            self.pace_ms = min(MAX_PACE_MS, max(PACE_STEP_MS, self.pace_ms * 2))
+        elif self.pace_ms:
+            verdict = "speed up"
+            self.pace_ms = max(0, self.pace_ms - PACE_STEP_MS)
+        elif self.limit < self.max_workers:
+            verdict = "speed up"
+            self.limit += 1
+        else:
+            verdict = "hold"
+        self.decisions[verdict] += 1
+        self.lowest = min(self.lowest, self.limit)
+        self.highest = max(self.highest, self.limit)
+
+        reason = f"n={n} errors={errors:.0%} retries={retries:.0%}"
+        if slow:
+            reason += ", slow: " + "; ".join(slow)
+        return (f"AIMD {verdict}: workers {old_limit}→{self.limit}, "
+                f"pace {old_pace}→{self.pace_ms}ms ({reason})")
+
+    def summary(self):
+        with self.cond:
+            return (f"{self.decisions['back off']} back-offs, "
+                    f"{self.decisions['speed up']} speed-ups, "
+                    f"{self.decisions['hold']} holds; workers "
+                    f"{self.lowest}-{self.highest} of {self.max_workers}, "
+                    f"now {self.limit} at {self.pace_ms}ms pace")
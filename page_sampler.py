@@ -0,0 +1,101 @@
+# =====================================================
+# ADAPTIVE PAGE-COUNT SAMPLER
+# =====================================================
+# Prices move almost linearly with page count, with the odd step at a
+# signature or spine-width threshold. Instead of scraping every page
+# count, scrape a coarse grid, then bisect each interval: scrape the
+# midpoint and only keep splitting where it is off the straight line
+# between the ends (or breaks monotonicity). Page counts that are never
+# scraped are filled from the neighbouring scraped ones, with bounds.
+
+DEFAULT_COARSE_STEP = 32
+DEFAULT_PAGE_TOLERANCE = 0.01  # relative deviation from linear
+
+
+def coarse_indices(pages, coarse_step):
+    step = pages[1] - pages[0] if len(pages) > 1 else 1
+    stride = max(1, coarse_step // step)
+    idx = list(range(0, len(pages), stride))
+    if idx[-1] != len(pages) - 1:
+        idx.append(len(pages) - 1)
+    return idx
+
+
+def linear(x0, y0, x1, y1, x):
+    return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+
+def midpoint_error(pages, obs, i, m, j):
+    # Worst relative deviation of the midpoint from the i–j line across
+    # all quantities; None when it can't be trusted (missing or
+    # non-monotone prices)
+    a, mid, b = obs.get(i), obs.get(m), obs.get(j)
+    if not a or not mid or not b:
+        return None
+
+    worst = 0.0
+    for qty in set(a) & set(mid) & set(b):
+        ya, ym, yb = a[qty], mid[qty], b[qty]
+        if not (min(ya, yb) <= ym <= max(ya, yb)):
+            return None
+        pred = linear(pages[i], ya, pages[j], yb, pages[m])
+        worst = max(worst, abs(ym - pred) / ym)
+    return worst
+
+
+def sample_pages(pages, fetch, coarse_step=DEFAULT_COARSE_STEP,
+                 tolerance=DEFAULT_PAGE_TOLERANCE, log=print):
+    # fetch(pg) → {qty: price} (empty/None on failure).
+    # Returns (scraped, filled): {pg: {qty: price}} and
+    # {pg: {qty: (price, low, high)}}.
+    pages = sorted(pages)
+    obs = {}
+
+    def observe(i):
+        if i not in obs:
+            obs[i] = {q: p for q, p in (fetch(pages[i]) or {}).items()
+                      if p is not None}
+        return obs[i]
+
+    coarse = coarse_indices(pages, coarse_step)
+    for i in coarse:
+        observe(i)
+
+    accepted = []  # (i, m, j, residual)
+    stack = list(reversed(list(zip(coarse, coarse[1:]))))
+    while stack:
+        i, j = stack.pop()
+        if j - i <= 1:
+            continue
+        m = (i + j) // 2
+        observe(m)
+        err = midpoint_error(pages, obs, i, m, j)
+        if err is not None and err <= tolerance:
+            accepted.append((i, m, j, err))
+        else:
+            log(f"Refining pp{pages[i]}–pp{pages[j]} "
+                f"({'broken' if err is None else f'{err:.2%}'} off linear)")
+            stack.append((m, j))
+            stack.append((i, m))
+
+    filled = {}
+    for i, m, j, err in accepted:
+        # Bounds: the deviation actually seen at the midpoint, but never
+        # tighter than the tolerance the interval passed with
+        spread = max(err, tolerance)
+        for k in range(i + 1, j):
+            if k in obs:
+                continue
+            lo, hi = (i, m) if k < m else (m, j)
+            prices = {}
+            for qty in set(obs[lo]) & set(obs[hi]):
+                p = linear(pages[lo], obs[lo][qty], pages[hi], obs[hi][qty],
+                           pages[k])
+                prices[qty] = (round(p, 2), round(p * (1 - spread), 2),
+                               round(p * (1 + spread), 2))
+            filled[pages[k]] = prices
+
+    scraped = {pages[i]: prices for i, prices in obs.items()}
+    log(f"Page sampler: scraped {len(scraped)} of {len(pages)} page counts, "
+        f"filled {len(filled)}")
+    return scraped, filled
@@ -0,0 +1,221 @@
+from math import prod
+
+# =====================================================
+# MINIMAL-DELTA TRAVERSAL PLANNER
+# =====================================================
+# Orders the option tuples as a reflected mixed-radix Gray code, so two
+# consecutive tuples differ in exactly one dropdown. Cheap dropdowns are
+# made the fastest-changing digits, expensive ones change least often.
+
+# Relative cost of one selection. Internal/Text Pages Stock rebuilds the
+# widget and resets Internal/Text Pages Printing, so it is the dearest.
+DROPDOWN_COSTS = {
+    "Quantity": 1.0,
+    "Internal/Text Pages (pp) Excluding Cover": 1.0,
+    "Cover Laminate (outside only)": 1.5,
+    "Cover Printing": 1.5,
+    "Internal/Text Pages Printing": 2.0,
+    "Cover Stock": 2.0,
+    "Internal/Text Pages Stock": 4.0,
+}
+
+# Selecting the key makes the widget reset the listed dropdowns
+RESETS = {
+    "Internal/Text Pages Stock": ("Internal/Text Pages Printing",),
+}
+
+def cost_of(label):
+    return DROPDOWN_COSTS.get(label, 1.0)
+
+
+# =====================================================
+# GRAY-CODE WALK
+# =====================================================
+def reflected_gray(radices):
+    # Yields (digits, changed_index); the innermost digit moves fastest
+    # and each digit reverses direction instead of wrapping around
+    n = len(radices)
+    if n == 0 or 0 in radices:
+        return
+    digits = [0] * n
+    dirs = [1] * n
+    yield tuple(digits), None
+
+    while True:
+        j = n - 1
+        while j >= 0:
+            nxt = digits[j] + dirs[j]
+            if 0 <= nxt < radices[j]:
+                break
+            dirs[j] = -dirs[j]
+            j -= 1
+        if j < 0:
+            return
+        digits[j] = nxt
+        yield tuple(digits), j
+
+
+def walk_order(labels):
+    # Most expensive dropdown outermost; ties keep the widget's order
+    return sorted(range(len(labels)), key=lambda i: -cost_of(labels[i]))
+
+
+def plan(dimensions):
+    # dimensions: [(label, values)] in widget order. Yields each tuple in
+    # that order plus the (label, value) selections that reach it from
+    # the previous step (every dropdown on the first step).
+    labels = [label for label, _ in dimensions]
+    order = walk_order(labels)
+    radices = [len(dimensions[i][1]) for i in order]
+
+    for digits, changed in reflected_gray(radices):
+        current = [None] * len(dimensions)
+        for pos, i in enumerate(order):
+            current[i] = dimensions[i][1][digits[pos]]
+
+        if changed is None:
+            changes = list(zip(labels, current))
+        else:
+            i = order[changed]
+            changes = [(labels[i], current[i])]
+        yield tuple(current), changes
+
+
+def delta(labels, previous, current):
+    # Dropdowns to re-select, in widget order, moving previous → current
+    if previous is None:
+        return list(zip(labels, current))
+    changes = []
+    for label, old, new in zip(labels, previous, current):
+        if old != new:
+            changes.append((label, new))
+    return changes
+
+
+# =====================================================
+# CROSS-MACHINE SHARDS (--shard i/N)
+# =====================================================
+def parse_shard(text):
+    # "i/N", 1-based → (i, N)
+    index, sep, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"shard must look like 2/8, not {text!r}")
+    if not sep or not 1 <= index <= count:
+        raise ValueError(f"shard must look like 2/8, not {text!r}")
+    return index, count
+
+
+def shard_slice(configs, index, count):
+    # Contiguous block i of N of the planned list. Every machine plans
+    # the same list, so the blocks cover it exactly once, and a block
+    # keeps the Gray walk's one-dropdown steps except at its edges.
+    start = (index - 1) * len(configs) // count
+    stop = index * len(configs) // count
+    return configs[start:stop]
+
+
+# =====================================================
+# ACTION ESTIMATES
+# =====================================================
+def count_changes(radices, reflected):
+    # Selections per digit for a walk with the last digit fastest;
+    # reflected: one flag per digit
+    counts = []
+    outer = 1
+    for r, reflect in zip(radices, reflected):
+        if reflect:
+            # Moves r-1 times per sweep, one sweep per outer step
+            counts.append(outer * (r - 1))
+        else:
+            # Lexicographic order also wraps back to the first value
+            counts.append(outer * r - 1 if r > 1 else 0)
+        outer *= r
+    return counts
+
+
+def weigh(labels, counts):
+    actions = sum(counts)
+    cost = 0.0
+    for label, n in zip(labels, counts):
+        cost += n * cost_of(label)
+        for reset in RESETS.get(label, ()):
+            if reset in labels:
+                actions += n
+                cost += n * cost_of(reset)
+    return actions, cost
+
+
+def estimate(dimensions, ascending=("Quantity",)):
+    # UI actions for: re-select everything, product() order, Gray plan.
+    # ascending: dimensions the caller walks in order for every config
+    # rather than reflected, so they wrap like a lexicographic digit
+    labels = [label for label, _ in dimensions]
+    radices = [len(values) for _, values in dimensions]
+    total = prod(radices)
+
+    naive_counts = [total] * len(labels)
+
+    lexi_counts = count_changes(radices, [False] * len(radices))
+
+    order = walk_order(labels)
+    gray = count_changes([radices[i] for i in order],
+                         [labels[i] not in ascending for i in order])
+    gray_counts = [0] * len(labels)
+    for pos, i in enumerate(order):
+        gray_counts[i] = gray[pos]
+
+    # Every ordering makes the first full selection once
+    lexi_counts = [n + 1 for n in lexi_counts]
+    gray_counts = [n + 1 for n in gray_counts]
+
+    result = {"combinations": total}
+    for name, counts in (
+        ("reselect_all", naive_counts),
+        ("product_order", lexi_counts),
+        ("gray_plan", gray_counts),
+    ):
+        actions, cost = weigh(labels, counts)
+        result[name] = {"actions": actions, "cost": round(cost, 1)}
+    return result
+
+
+def format_estimate(est):
+    rows = [f"{est['combinations']} combinations"]
+    for name in ("reselect_all", "product_order", "gray_plan"):
+        e = est[name]
+        rows.append(f"{name}: {e['actions']} selections (weighted cost {e['cost']})")
+    return rows
+
+
+# =====================================================
+# MAIN
+# =====================================================
+def main():
+    from scrapper import (
+        ASCENDING,
+        COVER_PRINTING,
+        COVER_STOCK,
+        INTERNAL_PRINTING,
+        INTERNAL_STOCK,
+        LAMINATE,
+        PAGES,
+        QUANTITIES,
+    )
+
+    dimensions = [
+        ("Cover Printing", list(COVER_PRINTING)),
+        ("Cover Stock", list(COVER_STOCK)),
+        ("Cover Laminate (outside only)", list(LAMINATE)),
+        ("Internal/Text Pages Printing", list(INTERNAL_PRINTING)),
+        ("Internal/Text Pages Stock", list(INTERNAL_STOCK)),
+        ("Internal/Text Pages (pp) Excluding Cover", PAGES),
+        ("Quantity", QUANTITIES),
+    ]
+    for row in format_estimate(estimate(dimensions, ASCENDING)):
+        print(f"[LOG] {row}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import re
+import threading
+from collections import Counter
+
+# =====================================================
+# PRICING XHR MATCHING
+# =====================================================
+# The PrintIQ widget prices through an XHR/fetch call whose path contains
+# one of these words. Override with --price-url if the endpoint changes.
+PRICE_URL_PATTERN = re.compile(r"price|quote|calculat", re.IGNORECASE)
+
+# Keys (lower-cased) that hold the total in the widget's JSON payload,
+# most specific first
+PRICE_KEYS = ("totalprice", "total_price", "sellprice", "price", "total", "amount")
+
+PRICE_BUTTON = "a.btn.btn-success.continue-button.filter-price-button"
+
+# The price the widget shows after a click
+PRICE_TEXT = ".product-price .price1"
+
+# Its text, or null before the first price
+PRICE_TEXT_JS = """
+sel => {
+  const el = document.querySelector(sel);
+  return el ? el.textContent.trim() : null;
+}
+"""
+
+# True once the shown price differs from the text read before the click
+PRICE_CHANGED_JS = """
+([sel, before]) => {
+  const el = document.querySelector(sel);
+  return !!el && el.textContent.trim() !== before;
+}
+"""
+
+
+def is_price_response(response, pattern=PRICE_URL_PATTERN):
+    if response.request.resource_type not in ("xhr", "fetch"):
+        return False
+    if response.status != 200:
+        return False
+    return bool(pattern.search(response.url))
+
+
+def to_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = value.replace("$", "").replace(",", "").strip()
+        try:
+            return float(cleaned)
+        except ValueError:
+            return None
+    return None
+
+
+def parse_price_payload(payload):
+    # Walk the JSON breadth-first so a top-level total wins over
+    # per-line prices nested further down
+    queue = [payload]
+    while queue:
+        node = queue.pop(0)
+        if isinstance(node, dict):
+            lowered = {str(k).lower(): v for k, v in node.items()}
+            for key in PRICE_KEYS:
+                if key in lowered:
+                    number = to_number(lowered[key])
+                    if number is not None:
+                        return number
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+    raise ValueError("No price field in pricing payload")
+
+
+# =====================================================
+# CAPTURE
+# =====================================================
+def click_and_capture(page, pattern=PRICE_URL_PATTERN, timeout=20000):
+    with page.expect_response(
+        lambda r: is_price_response(r, pattern),
+        timeout=timeout
+    ) as info:
+        page.locator(PRICE_BUTTON).click(force=True)
+
+    return parse_price_payload(info.value.json())
+
+
+# =====================================================
+# PER-RUN SOURCE COUNTER
+# =====================================================
+class PriceSourceCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def record(self, source):
+        with self.lock:
+            self.counts[source] += 1
+
+    def summary(self):
+        with self.lock:
+            total = sum(self.counts.values())
+            if not total:
+                return "no prices fetched"
+            return ", ".join(
+                f"{source}={n} ({n / total:.0%})"
+                for source, n in self.counts.most_common()
+            )
+
+
+PRICE_SOURCES = PriceSourceCounter()
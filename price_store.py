@@ -0,0 +1,331 @@
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+
+# =====================================================
+# SQLITE PRICE STORE
+# =====================================================
+# One row per scraped price. All inserts go through a single writer
+# thread that commits in batches, so parallel workers just enqueue and
+# never wait on SQLite's file lock. WAL mode lets readers query while a
+# run is still writing.
+#
+# The progress journal is written by the same thread, only after the
+# rows it lists are committed: a run killed between the two leaves
+# prices the journal doesn't know about (priced again), never journal
+# entries without a stored price (skipped forever).
+
+STORE_FILE = "prices.sqlite3"
+
+PRODUCT = "perfect-bound-48pp-plus"
+FINISHED_SIZE = "A5 Portrait - 148x210"
+
+# Option columns of one config, in CONFIG_LABELS order
+OPTION_COLUMNS = (
+    "cover_printing",
+    "cover_stock",
+    "laminate",
+    "internal_printing",
+    "internal_stock",
+    "pages",
+)
+
+KEY_COLUMNS = ("product", "size") + OPTION_COLUMNS + ("qty",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    id                INTEGER PRIMARY KEY,
+    product           TEXT    NOT NULL,
+    size              TEXT    NOT NULL,
+    cover_printing    TEXT    NOT NULL,
+    cover_stock       TEXT    NOT NULL,
+    laminate          TEXT    NOT NULL,
+    internal_printing TEXT    NOT NULL,
+    internal_stock    TEXT    NOT NULL,
+    pages             INTEGER NOT NULL,
+    qty               INTEGER NOT NULL,
+    price             REAL    NOT NULL,  -- widget price minus the $10 margin
+    scraped_at        TEXT    NOT NULL,
+    source            TEXT    NOT NULL DEFAULT 'scraped',  -- or 'interpolated'
+    price_low         REAL,              -- bounds for interpolated prices
+    price_high        REAL,
+    UNIQUE (product, size, cover_printing, cover_stock, laminate,
+            internal_printing, internal_stock, pages, qty, scraped_at)
+);
+
+CREATE INDEX IF NOT EXISTS idx_prices_config ON prices (
+    product, size, cover_printing, cover_stock, laminate,
+    internal_printing, internal_stock, pages, qty
+);
+
+CREATE TABLE IF NOT EXISTS scrape_errors (
+    id                INTEGER PRIMARY KEY,
+    product           TEXT    NOT NULL,
+    size              TEXT    NOT NULL,
+    cover_printing    TEXT    NOT NULL,
+    cover_stock       TEXT    NOT NULL,
+    laminate          TEXT    NOT NULL,
+    internal_printing TEXT    NOT NULL,
+    internal_stock    TEXT    NOT NULL,
+    pages             INTEGER NOT NULL,
+    qty               INTEGER,           -- NULL: the whole config failed
+    message           TEXT,
+    scraped_at        TEXT    NOT NULL
+);
+"""
+
+INSERT_PRICE = f"""
+INSERT OR REPLACE INTO prices ({", ".join(KEY_COLUMNS)}, price, scraped_at,
+                               source, price_low, price_high)
+VALUES ({", ".join("?" * (len(KEY_COLUMNS) + 5))})
+"""
+
+INSERT_ERROR = f"""
+INSERT INTO scrape_errors ({", ".join(KEY_COLUMNS)}, message, scraped_at)
+VALUES ({", ".join("?" * (len(KEY_COLUMNS) + 2))})
+"""
+
+
+def now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    migrate(conn)
+    return conn
+
+
+# Columns added after the first release of the store
+MIGRATIONS = (
+    ("source", "TEXT NOT NULL DEFAULT 'scraped'"),
+    ("price_low", "REAL"),
+    ("price_high", "REAL"),
+)
+
+
+def migrate(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(prices)")}
+    with conn:
+        for name, decl in MIGRATIONS:
+            if name not in columns:
+                conn.execute(f"ALTER TABLE prices ADD COLUMN {name} {decl}")
+
+
+# =====================================================
+# STORE
+# =====================================================
+class PriceStore:
+    def __init__(self, path=STORE_FILE, product=PRODUCT, size=FINISHED_SIZE,
+                 batch_size=500, batch_seconds=2.0, journal=None,
+                 max_queued=5000):
+        self.path = path
+        self.product = product
+        self.size = size
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.journal = journal
+
+        connect(path).close()  # create schema before anyone reads
+
+        # Bounded, so a producer faster than the commits (import_txt)
+        # blocks instead of piling rows up in memory
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.rows_written = 0
+        self.error = None  # what stopped the writer thread, if anything
+        self.closing = False
+        self.thread = threading.Thread(target=self.writer_loop,
+                                       name="price-store", daemon=True)
+        self.thread.start()
+
+    def key(self, cfg, qty):
+        return (self.product, self.size) + tuple(
+            str(v) for v in cfg[:-1]
+        ) + (int(cfg[-1]), None if qty is None else int(qty))
+
+    # Producers (any thread)
+    def put(self, item):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(item)
+
+    def add_price(self, cfg, qty, price, scraped_at=None, source="scraped",
+                  low=None, high=None):
+        row = self.key(cfg, qty) + (
+            round(price, 2), scraped_at or now(), source, low, high
+        )
+        self.put((INSERT_PRICE, row))
+
+    def add_error(self, cfg, qty, message, scraped_at=None):
+        row = self.key(cfg, qty) + (str(message)[:500], scraped_at or now())
+        self.put((INSERT_ERROR, row))
+
+    def write_config(self, cfg, results, error=None):
+        # results: [(qty, price)] optionally followed by source, low, high
+        stamp = now()
+        for qty, price, *extra in results:
+            if price is None:
+                self.add_error(cfg, qty, "price not fetched", stamp)
+            else:
+                self.add_price(cfg, qty, price, stamp, *extra)
+        if error is not None:
+            self.add_error(cfg, None, error, stamp)
+
+    def journal_when_committed(self, cfg, entries):
+        # entries: [(qty, price)], journaled once every row queued before
+        # them is committed
+        if self.journal is not None and entries:
+            self.put((None, (cfg, entries)))
+
+    # Single writer thread
+    def writer_loop(self):
+        try:
+            self.write_batches()
+        except Exception as e:
+            # Keep the error for the producers and close(), and keep
+            # taking items so nobody blocks on the bounded queue
+            self.error = e
+            while not self.closing:
+                self.closing = self.queue.get() is None
+
+    def write_batches(self):
+        conn = connect(self.path)
+        try:
+            batch = []
+            deadline = time.monotonic() + self.batch_seconds
+            while not self.closing:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    if item is None:
+                        self.closing = True
+                    else:
+                        batch.append(item)
+                except queue.Empty:
+                    pass
+
+                if batch and (self.closing or len(batch) >= self.batch_size
+                              or time.monotonic() >= deadline):
+                    with conn:
+                        for sql, row in batch:
+                            if sql is not None:
+                                conn.execute(sql, row)
+                    for sql, row in batch:
+                        if sql is None:
+                            cfg, entries = row
+                            for qty, price in entries:
+                                self.journal.record(cfg, qty, price)
+                        else:
+                            self.rows_written += 1
+                    batch = []
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + self.batch_seconds
+
+            # Fold the WAL back in so the .sqlite3 file is complete on its own
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+# =====================================================
+# QUERIES
+# =====================================================
+def latest_prices_sql(where=""):
+    # Newest row per key
+    return f"""
+        SELECT {", ".join(KEY_COLUMNS)}, price, MAX(scraped_at)
+        FROM prices {where}
+        GROUP BY {", ".join(KEY_COLUMNS)}
+    """
+
+
+def price_curve(conn, cfg, product=PRODUCT, size=FINISHED_SIZE):
+    # [(qty, price)] for one config, newest price per qty; served
+    # straight from idx_prices_config
+    params = (product, size) + tuple(str(v) for v in cfg[:-1]) + (int(cfg[-1]),)
+    where = " AND ".join(f"{c} = ?" for c in KEY_COLUMNS[:-1])
+    rows = conn.execute(
+        f"""SELECT qty, price, MAX(scraped_at) FROM prices
+            WHERE {where} GROUP BY qty ORDER BY qty""",
+        params,
+    ).fetchall()
+    return [(qty, price) for qty, price, _ in rows]
+
+
+def last_scraped(conn, product=PRODUCT, size=FINISHED_SIZE):
+    # {cfg: oldest of its newest per-qty timestamps}, i.e. how stale the
+    # config's curve is as a whole
+    cols = ", ".join(OPTION_COLUMNS)
+    rows = conn.execute(
+        f"""SELECT {cols}, MIN(latest) FROM (
+                SELECT {cols}, qty, MAX(scraped_at) AS latest FROM prices
+                WHERE product = ? AND size = ? GROUP BY {cols}, qty
+            ) GROUP BY {cols}""",
+        (product, size),
+    )
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def export_txt(conn, out, code_maps):
+    # Writes the legacy qty;;price layout for anyone still reading it.
+    # code_maps: one {label: code} dict per option column except pages.
+    rows = conn.execute(
+        latest_prices_sql() + f" ORDER BY {', '.join(KEY_COLUMNS)}"
+    ).fetchall()
+
+    current = None
+    for row in rows:
+        options = row[2:8]
+        if options != current:
+            if current is not None:
+                out.write("\n")
+            codes = [m.get(v, v) for m, v in zip(code_maps, options[:-1])]
+            out.write(f"A5P_{'_'.join(codes)}_pp{options[-1]}\n")
+            current = options
+        out.write(f"{row[8]};;{row[9]:.2f}\n")
+    if current is not None:
+        out.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--export-txt", metavar="PATH",
+                        help="write the latest prices in qty;;price layout")
+    args = parser.parse_args()
+
+    conn = connect(args.store)
+    if args.export_txt:
+        from scrapper import (
+            COVER_PRINTING,
+            COVER_STOCK,
+            INTERNAL_PRINTING,
+            INTERNAL_STOCK,
+            LAMINATE,
+        )
+
+        maps = [COVER_PRINTING, COVER_STOCK, LAMINATE, INTERNAL_PRINTING,
+                INTERNAL_STOCK]
+        with open(args.export_txt, "w", encoding="utf-8") as f:
+            export_txt(conn, f, maps)
+        print(f"[LOG] Exported to {args.export_txt}", flush=True)
+    else:
+        prices = conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+        errors = conn.execute("SELECT COUNT(*) FROM scrape_errors").fetchone()[0]
+        print(f"[LOG] {args.store}: {prices} prices, {errors} errors", flush=True)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
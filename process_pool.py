@@ -0,0 +1,87 @@
+import multiprocessing
+import queue
+
+from journal import journal_key, load_keys
+
+# =====================================================
+# PROCESS-POOL SHARDING (--processes)
+# =====================================================
+# Every shard is a separate Python process with its own browser, pricing
+# a fixed slice of the planned configs. Widget work, parsing and logging
+# no longer share one GIL, and a browser that crashes takes down one
+# shard instead of the run. Shards don't touch the store, text files or
+# journal: each finished config comes back over one queue with the
+# entries to journal, and the parent hands both to the usual writer, so
+# a shard that dies mid-config journals nothing of it.
+#
+# Processes are spawned, not forked: Playwright's driver and the store's
+# writer thread don't survive a fork.
+
+
+class QueueWriter:
+    # Shard side: stands in for the run's OutputFanout
+    def __init__(self, shard, results):
+        self.shard = shard
+        self.results = results
+
+    def write_config(self, cfg, results, error=None, journal=()):
+        self.results.put(("config", self.shard, cfg, results, error,
+                          list(journal)))
+
+
+class QueueJournal:
+    # Shard side: answers from the journal as it was when the shard
+    # started; new entries are written by the parent
+    def __init__(self, path):
+        self.done, _ = load_keys(path)
+
+    def is_done(self, cfg, qty):
+        return journal_key(cfg, qty) in self.done
+
+    def config_done(self, cfg, quantities):
+        return all(self.is_done(cfg, qty) for qty in quantities)
+
+
+def run_pool(target, chunks, extra_args, writer, log=print, poll=1.0):
+    # target(shard, configs, results, *extra_args) runs in each process
+    # and puts ("done", shard) last. Returns {shard: configs written}.
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = {
+        shard: ctx.Process(target=target,
+                           args=(shard, chunk, results) + tuple(extra_args),
+                           name=f"shard-{shard}")
+        for shard, chunk in enumerate(chunks, start=1)
+    }
+    for proc in procs.values():
+        proc.start()
+    log(f"Started {len(procs)} shard processes")
+
+    written = {shard: 0 for shard in procs}
+    finished = set()
+    while len(finished) < len(procs):
+        try:
+            item = results.get(timeout=poll)
+        except queue.Empty:
+            # A shard that died without saying so (browser took the
+            # process down); everything it sent is already in
+            for shard, proc in procs.items():
+                if shard not in finished and not proc.is_alive():
+                    finished.add(shard)
+                    log(f"Shard {shard} died (exit code {proc.exitcode}), "
+                        f"{written[shard]} of {len(chunks[shard - 1])} "
+                        f"configs written; the rest is left for the next run")
+            continue
+
+        kind = item[0]
+        if kind == "config":
+            shard, cfg, config_results, error, journal = item[1:]
+            writer.write_config(cfg, config_results, error, journal)
+            written[shard] += 1
+        elif kind == "done":
+            finished.add(item[1])
+            log(f"Shard {item[1]} done ({written[item[1]]} configs)")
+
+    for proc in procs.values():
+        proc.join()
+    return written
@@ -1,8 +1,12 @@
 import csv
+import os
+import sys
 import time
-from itertools import product
 from playwright.sync_api import sync_playwright
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from planner import RESETS, estimate, format_estimate, plan  # noqa: E402
+
 URL = "https://www.cmykonline.com.au/booklets-magazines/perfect-binding/perfect-bound-48pp-plus/"
 
 OUTPUT = "perfect_bound_all_quantities.csv"
@@ -101,46 +105,44 @@ with sync_playwright() as p:
             "Price"
         ])
 
-        total = (
-            len(COVER_PRINTING) * len(COVER_STOCK) * len(LAMINATE) *
-            len(INTERNAL_PRINTING) * len(INTERNAL_STOCK) *
-            len(PAGES) * len(QUANTITIES)
-        )
+        dimensions = [
+            ("Cover Printing", COVER_PRINTING),
+            ("Cover Stock", COVER_STOCK),
+            ("Cover Laminate (outside only)", LAMINATE),
+            ("Internal/Text Pages Printing", INTERNAL_PRINTING),
+            ("Internal/Text Pages Stock", INTERNAL_STOCK),
+            ("Internal/Text Pages (pp) Excluding Cover", PAGES),
+            ("Quantity", QUANTITIES),
+        ]
+
+        # Quantity is part of the reflected walk here
+        est = estimate(dimensions, ascending=())
+        total = est["combinations"]
 
         print(f"TOTAL combinations: {total}")
+        for row in format_estimate(est)[1:]:
+            print(f"UI actions, {row}")
 
         count = 0
+        synced = True  # False after a failure: re-select every dropdown
+
+        for combo, changes in plan(dimensions):
+            cp, cs, lm, ip, isd, pg, qty = combo
+            current = dict(zip([label for label, _ in dimensions], combo))
 
-        for (
-            cp,
-            cs,
-            lm,
-            ip,
-            isd,
-            pg,
-            qty
-        ) in product(
-            COVER_PRINTING,
-            COVER_STOCK,
-            LAMINATE,
-            INTERNAL_PRINTING,
-            INTERNAL_STOCK,
-            PAGES,
-            QUANTITIES
-        ):
+            if not synced:
+                changes = list(current.items())
 
             try:
-                select_option(page, "Cover Printing", cp)
-                select_option(page, "Cover Stock", cs)
-                select_option(page, "Cover Laminate (outside only)", lm)
-                select_option(page, "Internal/Text Pages Printing", ip)
-                select_option(page, "Internal/Text Pages Stock", isd)
-                select_option(page, "Internal/Text Pages (pp) Excluding Cover", pg)
-                select_option(page, "Quantity", qty)
+                for label, value in changes:
+                    select_option(page, label, value)
+                    for reset in RESETS.get(label, ()):
+                        select_option(page, reset, current[reset])
 
                 price_text = get_price(page)
 
                 writer.writerow([cp, cs, lm, ip, isd, pg, qty, price_text])
+                synced = True
 
                 count += 1
                 print(f"[{count}/{total}] {cp}, {cs}, {lm}, {ip}, {isd}, {pg}, {qty} → {price_text}")
@@ -149,6 +151,7 @@ with sync_playwright() as p:
 
             except Exception as e:
                 print("FAILED at:", cp, cs, lm, ip, isd, pg, qty, " — reason:", e)
+                synced = False
                 time.sleep(2)
 
     browser.close()
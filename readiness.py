@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from price_capture import PRICE_BUTTON
+
+# =====================================================
+# EVENT-DRIVEN READINESS WAITS
+# =====================================================
+# Replaces the fixed time.sleep / wait_for_timeout pauses. Every wait
+# returns as soon as its signal fires and its real duration is recorded.
+
+# Counts in-flight XHR/fetch calls inside the page. Installed as an init
+# script so it survives reloads.
+NETWORK_TRACKER_JS = """
+(() => {
+  if (window.__pqTracker) return;
+  window.__pqTracker = true;
+  window.__pqPending = 0;
+  window.__pqLastActivity = performance.now();
+  const done = () => {
+    window.__pqPending = Math.max(0, window.__pqPending - 1);
+    window.__pqLastActivity = performance.now();
+  };
+  const start = () => {
+    window.__pqPending += 1;
+    window.__pqLastActivity = performance.now();
+  };
+  const send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function (...args) {
+    start();
+    this.addEventListener('loadend', done, { once: true });
+    return send.apply(this, args);
+  };
+  if (window.fetch) {
+    const origFetch = window.fetch;
+    window.fetch = function (...args) {
+      start();
+      return origFetch.apply(this, args).finally(done);
+    };
+  }
+})();
+"""
+
+NETWORK_IDLE_JS = """
+quietMs => (window.__pqPending || 0) === 0
+  && performance.now() - (window.__pqLastActivity || 0) >= quietMs
+"""
+
+PRICE_BUTTON_READY_JS = """
+sel => {
+  const b = document.querySelector(sel);
+  return !!b && !b.disabled && !b.classList.contains('disabled')
+    && b.getAttribute('aria-disabled') !== 'true';
+}
+"""
+
+
+# =====================================================
+# WAIT TIMING RECORDER
+# =====================================================
+class WaitRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.times = defaultdict(list)
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.times[name].append(seconds)
+
+    def summary(self):
+        with self.lock:
+            rows = []
+            for name, values in sorted(self.times.items()):
+                total = sum(values)
+                rows.append(
+                    f"{name}: n={len(values)} total={total:.1f}s "
+                    f"avg={total / len(values) * 1000:.0f}ms "
+                    f"max={max(values) * 1000:.0f}ms"
+                )
+            return rows
+
+
+WAIT_TIMES = WaitRecorder()
+
+
+@contextmanager
+def timed_wait(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        WAIT_TIMES.record(name, time.perf_counter() - started)
+
+
+# =====================================================
+# WAITS
+# =====================================================
+def install_network_tracker(page):
+    page.add_init_script(NETWORK_TRACKER_JS)
+    page.evaluate(NETWORK_TRACKER_JS)
+
+
+def wait_network_idle(page, quiet_ms=150, timeout=15000):
+    with timed_wait("network_idle"):
+        page.wait_for_function(NETWORK_IDLE_JS, arg=quiet_ms, timeout=timeout)
+
+
+def wait_widget_ready(page, timeout=30000):
+    # After goto/reload: document loaded, widget rendered, no XHR pending
+    with timed_wait("widget_ready"):
+        page.wait_for_load_state("networkidle", timeout=timeout)
+        page.locator(".control-group a.dropdown-toggle.filter-button").first.wait_for(
+            state="visible", timeout=timeout
+        )
+    wait_network_idle(page, timeout=timeout)
+
+
+def wait_menu_ready(group, timeout=5000):
+    # The menu items exist as soon as the toggle has been handled
+    with timed_wait("menu_ready"):
+        group.locator("ul.dropdown-menu a.filter-option").first.wait_for(
+            state="attached", timeout=timeout
+        )
+
+
+def wait_filter_text(group, value, timeout=5000):
+    with timed_wait("filter_text"):
+        group.locator(".filter-text", has_text=str(value)).wait_for(
+            state="attached", timeout=timeout
+        )
+
+
+def wait_selection(page, group, value, timeout=5000):
+    # A selection is done once the label shows it and the selection XHR
+    # has settled
+    wait_filter_text(group, value, timeout)
+    wait_network_idle(page, timeout=timeout)
+
+
+def wait_price_button(page, timeout=15000):
+    with timed_wait("price_button"):
+        page.wait_for_function(PRICE_BUTTON_READY_JS, arg=PRICE_BUTTON,
+                               timeout=timeout)
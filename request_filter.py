@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+from price_capture import PRICE_URL_PATTERN
+
+# =====================================================
+# REQUEST FILTER (context.route ALLOWLIST)
+# =====================================================
+# Only the storefront document, first-party / PrintIQ scripts, styles and
+# XHRs, and the pricing calls reach the network. Images, fonts, media,
+# trackers and other third-party requests are aborted before they leave
+# the browser, so goto() and reload() only pull what the widget needs.
+#
+# Aborted requests have no response, so bytes saved are estimated from a
+# table of sizes learned on unfiltered runs (--no-block-assets), keyed by
+# URL without its query string.
+#
+# Allowed static assets can be handed to an AssetCache (asset_cache.py)
+# instead of going to the network.
+
+SIZES_FILE = "blocked_sizes.json"
+
+BLOCKED_TYPES = {"image", "media", "font"}
+
+# Hosts the widget is served from besides the storefront itself
+ALLOW_HOSTS = ("printiq.com",)
+
+TRACKER_PATTERN = re.compile(
+    r"google-analytics|googletagmanager|googleadservices|doubleclick|"
+    r"facebook\.(net|com)|connect\.facebook|hotjar|clarity\.ms|tawk\.to|"
+    r"zendesk|zopim|intercom|hubspot|hs-scripts|livechat|newrelic|nr-data|"
+    r"segment\.(io|com)|mixpanel|bat\.bing|linkedin|tiktok|pinterest|"
+    r"/gtag/|/gtm\.js|/analytics\.js|/pixel",
+    re.IGNORECASE,
+)
+
+
+def host_matches(host, suffix):
+    return host == suffix or host.endswith("." + suffix)
+
+
+def size_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class RequestFilter:
+    def __init__(self, site_url, allow_hosts=ALLOW_HOSTS, block=True,
+                 sizes_path=SIZES_FILE, cache=None):
+        host = urlsplit(site_url).hostname or ""
+        site = host[4:] if host.startswith("www.") else host
+        self.allow_hosts = (site,) + tuple(allow_hosts)
+        self.block = block
+        self.sizes_path = sizes_path
+        self.cache = cache
+
+        self.lock = threading.Lock()
+        self.allowed = 0
+        self.blocked = Counter()  # reason → requests
+        self.saved_bytes = 0
+        self.unknown_size = 0
+        self.sizes = {}
+        if sizes_path and os.path.exists(sizes_path):
+            with open(sizes_path, encoding="utf-8") as f:
+                self.sizes = json.load(f)
+        self.learned = 0
+
+    def verdict(self, url, resource_type):
+        # None to let the request through, else the reason to block it
+        if resource_type in BLOCKED_TYPES:
+            return resource_type
+        if TRACKER_PATTERN.search(url):
+            return "analytics"
+        if resource_type in ("xhr", "fetch") and PRICE_URL_PATTERN.search(url):
+            return None
+        host = urlsplit(url).hostname or ""
+        if not any(host_matches(host, h) for h in self.allow_hosts):
+            return "third-party"
+        return None
+
+    def decide(self, request):
+        # Counts the request and returns why it is blocked, or None
+        reason = None
+        if self.block:
+            reason = self.verdict(request.url, request.resource_type)
+        size = self.sizes.get(size_key(request.url))
+        with self.lock:
+            if reason is None:
+                self.allowed += 1
+            else:
+                self.blocked[reason] += 1
+                if size is None:
+                    self.unknown_size += 1
+                else:
+                    self.saved_bytes += size
+        return reason
+
+    # Route handler (runs on the thread that owns the page)
+    def handle(self, route):
+        request = route.request
+        if self.decide(request) is not None:
+            route.abort("blockedbyclient")
+        elif self.cache and self.cache.handles(request):
+            self.cache.serve(route)
+        else:
+            route.continue_()
+
+    # Same for the async API; the asset cache is sync-only, so allowed
+    # requests always go to the network
+    async def handle_async(self, route):
+        if self.decide(route.request) is not None:
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    # requestfinished listener for unfiltered runs: remember how big the
+    # requests we would have blocked are
+    def learn(self, request):
+        if self.verdict(request.url, request.resource_type) is None:
+            return
+        try:
+            sizes = request.sizes()
+        except Exception:
+            return
+        size = sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        with self.lock:
+            self.sizes[size_key(request.url)] = max(size, 0)
+            self.learned += 1
+
+    def install(self, target):
+        # target: a BrowserContext or a Page
+        if self.block or self.cache:
+            target.route("**/*", self.handle)
+        if not self.block:
+            target.on("requestfinished", self.learn)
+
+    async def install_async(self, target):
+        # Sizes are only learned by the sync scraper (request.sizes() is
+        # a coroutine here)
+        if self.block:
+            await target.route("**/*", self.handle_async)
+
+    def close(self):
+        if self.learned and self.sizes_path:
+            with self.lock:
+                sizes = dict(self.sizes)
+            # Per process: shard processes close their filters at once
+            tmp = f"{self.sizes_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(sizes, f, indent=0, sort_keys=True)
+            os.replace(tmp, self.sizes_path)
+
+    def summary(self):
+        with self.lock:
+            if not self.block:
+                return (f"off, learned sizes of {self.learned} blockable "
+                        f"requests ({len(self.sizes)} URLs known)")
+            total = sum(self.blocked.values())
+            text = f"blocked {total} of {total + self.allowed} requests"
+            if total:
+                text += " (" + ", ".join(
+                    f"{k}={v}" for k, v in self.blocked.most_common()) + ")"
+            text += f", ~{self.saved_bytes / 1_000_000:.1f} MB saved"
+            if self.unknown_size:
+                text += f" + {self.unknown_size} requests of unknown size"
+            return text
@@ -0,0 +1,108 @@
+import re
+import threading
+import time
+
+# =====================================================
+# DEADLINE-AWARE SCHEDULING (--time-budget)
+# =====================================================
+# CI kills the job at a fixed wall-clock limit whatever it is doing. With
+# a budget, configs are ordered by how much a run needs them (missing
+# prices first, then the stalest priced ones), a config is only started
+# when its estimated cost still fits before the deadline, and the run
+# then stops on its own with time left to flush the store and journal.
+#
+# The cost of a config is learned as seconds per priced quantity, from
+# the configs finished so far, times the quantities it still needs.
+
+# Seconds kept free at the end for closing the store, journal and files
+DEFAULT_RESERVE = 120.0
+
+# Cost assumed per quantity until the first config finished
+INITIAL_SECONDS_PER_QTY = 6.0
+
+# Estimates are padded by this factor: a config that overruns pushes the
+# whole run towards the kill
+SAFETY = 1.5
+
+DURATION = re.compile(r"^\s*([\d.]+)\s*([smh]?)\s*$", re.IGNORECASE)
+UNITS = {"s": 1, "m": 60, "h": 3600, "": 60}
+
+
+def parse_duration(text):
+    # "340m", "5.5h", "900s"; a bare number is minutes
+    m = DURATION.match(text)
+    if not m:
+        raise ValueError(f"not a duration: {text!r} (e.g. 340m, 5.5h)")
+    return float(m[1]) * UNITS[m[2].lower()]
+
+
+def by_priority(configs, is_missing, last_scraped):
+    # Missing configs in planned order, then priced ones oldest first.
+    # last_scraped: {cfg: oldest of its newest per-qty timestamps}
+    missing = [cfg for cfg in configs if is_missing(cfg)]
+    priced = [cfg for cfg in configs if not is_missing(cfg)]
+    rank = {cfg: i for i, cfg in enumerate(configs)}
+    priced.sort(key=lambda cfg: (last_scraped.get(cfg, ""), rank[cfg]))
+    return missing, priced
+
+
+class TimeBudget:
+    # deadline is wall-clock (time.time()), so shard processes share it
+    def __init__(self, deadline, reserve=DEFAULT_RESERVE, log=print):
+        self.deadline = deadline
+        self.reserve = reserve
+        self.log = log
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.seconds = 0.0
+        self.quantities = 0
+        self.finished = 0
+        self.skipped = 0
+        self.cut_short = 0
+        self.announced = False
+
+    def remaining(self):
+        return self.deadline - self.reserve - time.time()
+
+    def per_qty(self):
+        with self.lock:
+            if not self.quantities:
+                return INITIAL_SECONDS_PER_QTY
+            return self.seconds / self.quantities
+
+    def estimate(self, quantities):
+        return max(1, quantities) * self.per_qty() * SAFETY
+
+    def can_start(self, quantities):
+        return self.remaining() >= self.estimate(quantities)
+
+    def stop(self, left, quantities):
+        # A worker gives up with `left` configs it will not start
+        with self.lock:
+            self.skipped += left
+            announce = not self.announced
+            self.announced = True
+        if announce:
+            self.log(f"Time budget: {max(0.0, self.remaining()):.0f}s left, "
+                     f"next config needs ~{self.estimate(quantities):.0f}s; "
+                     f"starting no more configs")
+
+    def expired(self):
+        # Past the point where only the flush should still run
+        return self.remaining() <= 0
+
+    def record(self, seconds, quantities, complete=True):
+        with self.lock:
+            if quantities:
+                self.seconds += seconds
+                self.quantities += quantities
+            self.finished += 1
+            if not complete:
+                self.cut_short += 1
+
+    def summary(self):
+        used = time.time() - self.started
+        total = self.deadline - self.started
+        return (f"used {used / 60:.1f} of {total / 60:.1f} min, "
+                f"{self.finished} configs run ({self.cut_short} cut short), "
+                f"{self.skipped} not started, ~{self.per_qty():.1f}s per price")
@@ -1,7 +1,76 @@
+import argparse
+import os
+import re
+import threading
 import time
-from itertools import product
+from contextlib import nullcontext
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
 
+from asset_cache import CACHE_DIR, DEFAULT_MAX_BYTES, AssetCache
+from browser_server import ENDPOINT_ENV, open_browser
+from browser_server import connect as connect_browser
+from catalog import CATALOG_FILE, invalid_choices, refresh_catalog
+from dependencies import DEPENDENCIES, ChangePlan
+from instrument import add_listener, count_attempt, instrumented
+from instrument import dump as dump_step_timings
+from instrument import enable as enable_instrumentation
+from interpolate import (
+    DEFAULT_ANCHORS,
+    DEFAULT_SPOT_CHECKS,
+    DEFAULT_TOLERANCE,
+    price_with_interpolation,
+)
+from jobs import JobTxtWriter, load_job, savings_summary
+from journal import JOURNAL_FILE, ProgressJournal
+from pacing import WINDOW as AIMD_WINDOW
+from pacing import AIMDController
+from page_sampler import (
+    DEFAULT_COARSE_STEP,
+    DEFAULT_PAGE_TOLERANCE,
+    sample_pages,
+)
+from planner import delta, parse_shard, plan, shard_slice
+from price_capture import (
+    PRICE_BUTTON,
+    PRICE_CHANGED_JS,
+    PRICE_SOURCES,
+    PRICE_TEXT,
+    PRICE_TEXT_JS,
+    PRICE_URL_PATTERN,
+    click_and_capture,
+)
+from price_store import (
+    FINISHED_SIZE,
+    STORE_FILE,
+    PriceStore,
+    connect,
+    last_scraped,
+    price_curve,
+)
+from process_pool import QueueJournal, QueueWriter, run_pool
+from readiness import (
+    WAIT_TIMES,
+    install_network_tracker,
+    timed_wait,
+    wait_menu_ready,
+    wait_network_idle,
+    wait_price_button,
+    wait_selection,
+    wait_widget_ready,
+)
+from request_filter import ALLOW_HOSTS, RequestFilter
+from scheduler import DEFAULT_RESERVE, TimeBudget, by_priority, parse_duration
+from selection_cache import (
+    already_selected,
+    cache_summary,
+    forget_selection,
+    install_widget_observer,
+    remember_selection,
+    widget_token,
+)
+from widget_state import RECOVERIES, read_selections, restore_state, snapshot
+
 URL = "https://www.cmykonline.com.au/booklets-magazines/perfect-binding/perfect-bound-48pp-plus/"
 
 COVER_PRINTING = {"Full Colour (CMYK) one side": "ones"}
@@ -18,12 +87,53 @@ OUTPUT_FILE = (
     f"{INTERNAL_STOCK['115gsm Gloss Artpaper']}.txt"
 )
 
-print(OUTPUT_FILE)
-# exit()
-
-
 PAGES = list(range(132, 302, 2))
 QUANTITIES = [5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 130, 140, 150, 160, 170, 180, 190, 200, 225, 250, 275, 300]
+# scrape_config prices every quantity of a config in this order
+ASCENDING = ("Quantity",)
+
+# Workers attach to the one Chromium process through this debugging port
+CDP_PORT = 9222
+
+# Skip selections the widget already shows (--no-selection-cache to disable)
+SELECTION_CACHE = True
+
+# Progress journal shared by all workers; set up in main()
+JOURNAL = None
+
+# Anchor-quantity mode settings (anchors, spot_checks, tolerance), or
+# None to scrape every quantity; set from --interpolate
+INTERPOLATION = None
+
+# Page-sampler settings (coarse_step, tolerance), or None to scrape every
+# page count; set from --adaptive-pages
+ADAPTIVE_PAGES = None
+
+# Price store shared by all workers; set up in main()
+STORE = None
+
+# Job spec (jobs.py) the option sets above came from, or None; --job
+JOB = None
+
+# Aborts images, fonts, trackers and third-party requests in every
+# context; set up in main() (--no-block-assets to only learn sizes)
+REQUEST_FILTER = None
+
+# Deadline for starting configs (scheduler.TimeBudget), or None;
+# set from --time-budget
+BUDGET = None
+
+# Already-priced configs the budget scheduler queued for a refresh; the
+# journal doesn't skip their quantities
+REFRESH = frozenset()
+
+# AIMD controller pacing the widget actions and gating workers, or None;
+# set from --aimd
+CONTROLLER = None
+
+# Read prices from the widget's pricing XHR instead of the DOM (--capture-xhr)
+CAPTURE_XHR = False
+PRICE_URL = PRICE_URL_PATTERN
 
 
 def log(msg):
@@ -35,13 +145,34 @@ def ensure_page_alive(page):
         raise Exception("Page was closed by widget reload")
 
 
+def settle(page):
+    # Retry backoff: let whatever the widget is doing finish instead of
+    # sleeping a fixed 600 ms
+    try:
+        wait_network_idle(page, timeout=5000)
+    except PlaywrightTimeoutError:
+        pass
+
+
+@instrumented("page.reload")
+def reload_page(page):
+    page.reload(timeout=60000)
+
+
 # =====================================================
 # PRINTIQ-SAFE DROPDOWN SELECTOR
 # =====================================================
+@instrumented("select_option", label_arg=1)
 def select_option(page, label_text, value, retries=10):
     value_str = str(value)
 
+    if SELECTION_CACHE and already_selected(page, label_text, value_str):
+        return
+
     for attempt in range(1, retries + 1):
+        count_attempt()
+        if CONTROLLER:
+            CONTROLLER.pace()
         try:
             ensure_page_alive(page)
             log(f'Selecting "{value_str}" for "{label_text}" (attempt {attempt})')
@@ -54,7 +185,7 @@ def select_option(page, label_text, value, retries=10):
 
             # Open dropdown (do NOT wait for menu visibility)
             group.locator("a.dropdown-toggle.filter-button").click(force=True)
-            page.wait_for_timeout(200)  # allow animation frame
+            wait_menu_ready(group)
 
             menu = group.locator("ul.dropdown-menu")
 
@@ -68,16 +199,16 @@ def select_option(page, label_text, value, retries=10):
                     has_text=value_str
                 ).first.click(force=True)
 
-            page.wait_for_timeout(300)
-
-            if value_str in group.locator(".filter-text").inner_text():
+            try:
+                wait_selection(page, group, value_str)
+                remember_selection(page, label_text, value_str)
                 return
-
-            raise Exception("Selection did not stick")
+            except PlaywrightTimeoutError:
+                raise Exception("Selection did not stick")
 
         except Exception as e:
             log(f"Retrying dropdown: {e}")
-            page.wait_for_timeout(600)
+            settle(page)
 
     raise Exception(f'FAILED selecting "{value_str}" for "{label_text}"')
 
@@ -85,10 +216,18 @@ def select_option(page, label_text, value, retries=10):
 # =====================================================
 # FORCE INTERNAL PRINTING (Widget Resets It)
 # =====================================================
+@instrumented("force_internal_printing")
 def force_internal_printing(page, value):
+    label_text = "Internal/Text Pages Printing"
+    if SELECTION_CACHE and already_selected(page, label_text, value):
+        return
+
     log("FORCING Internal/Text Pages Printing")
 
     for attempt in range(1, 4):
+        count_attempt()
+        if CONTROLLER:
+            CONTROLLER.pace()
         try:
             ensure_page_alive(page)
 
@@ -97,7 +236,7 @@ def force_internal_printing(page, value):
             )
             group.wait_for(state="visible", timeout=15000)
             group.locator("a.dropdown-toggle.filter-button").click(force=True)
-            page.wait_for_timeout(200)
+            wait_menu_ready(group)
 
             option = group.locator(
                 "ul.dropdown-menu a.filter-option",
@@ -105,157 +244,907 @@ def force_internal_printing(page, value):
             ).first
 
             option.click(force=True)
-            page.wait_for_timeout(400)
+            wait_selection(page, group, value)
+            remember_selection(page, label_text, value)
 
-            if value in group.locator(".filter-text").inner_text():
-                log("Internal printing locked ✅")
-                return
+            log("Internal printing locked ✅")
+            return
 
         except Exception as e:
             log(f"Retry internal printing: {e}")
-            page.wait_for_timeout(600)
+            settle(page)
 
     raise Exception("Internal/Text Pages Printing NOT locked")
 
 # =====================================================
 # APPLY CONFIG
 # =====================================================
+@instrumented("apply_current_config")
 def apply_current_config(page, cp, cs, lm, ip, ist, pg):
     ensure_page_alive(page)
 
-    page.wait_for_load_state("networkidle")
-    time.sleep(2)
+    wait_widget_ready(page)
 
-    select_option(page, "Finished Size (mm)", "A5 Portrait - 148x210")
-    time.sleep(0.5)
+    select_option(page, "Finished Size (mm)", FINISHED_SIZE)
     select_option(page, "Cover Printing", cp)
-    time.sleep(0.5)
     select_option(page, "Cover Stock", cs)
-    time.sleep(0.5)
     select_option(page, "Cover Laminate (outside only)", lm)
-    time.sleep(0.5)
-    force_internal_printing(page, ip)
-    time.sleep(0.5)
+    # Changing the stock resets the printing (planner.RESETS), so it goes first
     select_option(page, "Internal/Text Pages Stock", ist)
-    time.sleep(0.5)
+    force_internal_printing(page, ip)
     select_option(page, "Internal/Text Pages (pp) Excluding Cover", pg)
-    time.sleep(0.5)
 
 
 # =====================================================
 # PRICE FETCH (COMMA-SAFE)
 # =====================================================
+def read_dom_price(page, before=None):
+    # before: the text shown before the click; when given, the read waits
+    # for the widget to replace it, so an old price is never returned
+    page.wait_for_selector(PRICE_TEXT, timeout=20000)
+    if before is not None:
+        try:
+            page.wait_for_function(PRICE_CHANGED_JS, arg=[PRICE_TEXT, before],
+                                   timeout=20000)
+        except PlaywrightTimeoutError:
+            raise Exception(f"Shown price stayed at {before} after the click")
+
+    raw = page.locator(PRICE_TEXT).inner_text()
+
+    return float(
+        raw.replace("$", "").replace(",", "").strip()
+    )
+
+
+@instrumented("get_price")
 def get_price(page):
+    count_attempt()
     ensure_page_alive(page)
+    wait_price_button(page)
+    if CONTROLLER:
+        CONTROLLER.pace()
 
-    page.locator(
-        "a.btn.btn-success.continue-button.filter-price-button"
-    ).click(force=True)
+    before = None
+    if CAPTURE_XHR:
+        # For the fallback: the DOM may still show the last price
+        before = page.evaluate(PRICE_TEXT_JS, PRICE_TEXT)
+        try:
+            price = click_and_capture(page, PRICE_URL)
+            PRICE_SOURCES.record("xhr")
+            log(f"Price {price:.2f} from pricing XHR")
+            return price
+        except Exception as e:
+            # The button was already clicked, so the DOM will still refresh
+            log(f"XHR capture failed, falling back to DOM: {e}")
+    else:
+        page.locator(PRICE_BUTTON).click(force=True)
 
-    page.wait_for_selector(".product-price .price1", timeout=20000)
+    price = read_dom_price(page, before)
+    PRICE_SOURCES.record("dom")
+    return price
 
-    raw = page.locator(".product-price .price1").inner_text()
 
-    return float(
-        raw.replace("$", "").replace(",", "").strip()
+# =====================================================
+# SHARED OUTPUT WRITER
+# =====================================================
+class OutputWriter:
+    # Legacy qty;;price text file. Every worker hands over a whole config
+    # block at once, so blocks from different workers never interleave.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write_config(self, cfg, results, error=None):
+        lines = [config_name(*cfg) + "\n"]
+        for qty, price, *_ in results:
+            if price is None:
+                lines.append(f"{qty};;ERROR\n")
+            else:
+                lines.append(f"{qty};;{price:.2f}\n")
+        lines.append("CONFIG ERROR\n\n" if error is not None else "\n")
+
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+
+
+class OutputFanout:
+    # Hands every finished config to each output (store, text file, ...);
+    # the first output is the store
+    def __init__(self, store, *outputs):
+        self.store = store
+        self.outputs = [o for o in (store,) + outputs if o is not None]
+
+    def write_config(self, cfg, results, error=None, journal=()):
+        # journal: [(qty, price)] to journal once the store committed them
+        for output in self.outputs:
+            output.write_config(cfg, results, error)
+        if journal:
+            self.store.journal_when_committed(cfg, journal)
+
+
+def output_for(store, txt_output=None):
+    # The store, plus the legacy text file(s) when asked for
+    if txt_output:
+        txt_writer = OutputWriter(txt_output)
+    elif JOB and JOB.txt_output:
+        txt_writer = JobTxtWriter(JOB, OutputWriter)
+    else:
+        txt_writer = None
+    return OutputFanout(store, txt_writer)
+
+
+# =====================================================
+# CONFIG LIST
+# =====================================================
+# Dropdowns of one config tuple, in widget order
+CONFIG_LABELS = [
+    "Cover Printing",
+    "Cover Stock",
+    "Cover Laminate (outside only)",
+    "Internal/Text Pages Printing",
+    "Internal/Text Pages Stock",
+    "Internal/Text Pages (pp) Excluding Cover",
+]
+
+
+def config_dimensions():
+    return list(zip(CONFIG_LABELS, [
+        list(COVER_PRINTING),
+        list(COVER_STOCK),
+        list(LAMINATE),
+        list(INTERNAL_PRINTING),
+        list(INTERNAL_STOCK),
+        PAGES,
+    ]))
+
+
+def build_configs():
+    # Gray-code order: consecutive configs differ in one dropdown
+    return [
+        cfg for cfg, _ in plan(config_dimensions())
+        if JOB is None or JOB.allows(cfg)
+    ]
+
+
+def partition(configs, workers):
+    # Round-robin keeps neighbouring page counts on different workers,
+    # so every worker gets the same mix of cheap and expensive configs
+    return [configs[i::workers] for i in range(workers)]
+
+
+def partition_by_prefix(configs, workers):
+    # The page sampler needs a prefix's whole page sweep on one worker
+    groups = [
+        [prefix + (pg,) for pg in pages]
+        for prefix, pages in group_by_prefix(configs)
+    ]
+    return [
+        [cfg for group in groups[i::workers] for cfg in group]
+        for i in range(min(workers, len(groups)))
+    ]
+
+
+def config_name(cp, cs, lm, ip, ist, pg):
+    return (
+        f"A5P_{COVER_PRINTING[cp]}_{COVER_STOCK[cs]}_"
+        f"{LAMINATE[lm]}_{INTERNAL_PRINTING[ip]}_{INTERNAL_STOCK[ist]}_pp{pg}"
     )
 
 
 # =====================================================
-# MAIN
+# PAGE SETUP
+# =====================================================
+def open_widget(page, cfg=None):
+    with timed_wait("widget_setup"):
+        install_network_tracker(page)
+        install_widget_observer(page)
+        page.goto(URL, timeout=60000)
+        wait_widget_ready(page)
+        log("Page loaded")
+
+        cp, cs, lm, ip, ist, pg = cfg or build_configs()[0]
+
+        select_option(page, "Finished Size (mm)", FINISHED_SIZE)
+        select_option(page, "Cover Printing", cp)
+        select_option(page, "Cover Stock", cs)
+        select_option(page, "Cover Laminate (outside only)", lm)
+        # Changing the stock resets the printing (planner.RESETS), so it
+        # goes first
+        select_option(page, "Internal/Text Pages Stock", ist)
+        force_internal_printing(page, ip)
+
+    # Everything but the page count is now on screen
+    return (cp, cs, lm, ip, ist, None)
+
+
+# =====================================================
+# APPLY ONLY WHAT CHANGED
+# =====================================================
+def select_dropdown(page, label, value):
+    if label == "Internal/Text Pages Printing":
+        force_internal_printing(page, value)
+    else:
+        select_option(page, label, value)
+
+
+def expected_selections(cfg):
+    expected = {"Finished Size (mm)": FINISHED_SIZE}
+    expected.update(zip(CONFIG_LABELS, cfg))
+    return expected
+
+
+def apply_changes(page, changes, cfg, max_passes=3):
+    # Selects the changes, then re-applies only what they invalidated:
+    # declared resets always, anything else when it visibly drifted
+    # (dependencies.ChangePlan decides, async_engine.py shares it)
+    plan = ChangePlan(expected_selections(cfg), changes,
+                      max_passes=max_passes)
+    while plan.pending:
+        label, value = plan.next()
+        select_dropdown(page, label, value)
+
+        # The widget resets some dropdowns after this one changes, even
+        # when it does so without rebuilding the DOM
+        forget, keep = plan.after(label, read_selections(page), log)
+        token = widget_token(page) if keep else None  # once per pass
+        for other, want in keep:
+            remember_selection(page, other, want, token)
+        for other in forget:
+            forget_selection(page, other)
+
+
 # =====================================================
-with sync_playwright() as p:
+# SCRAPE ONE CONFIG
+# =====================================================
+def recover(page, cfg):
+    # Reload, then restore the config from the widget's own saved state;
+    # only dropdowns that didn't come back are replayed
+    started = time.perf_counter()
+    snap = snapshot(page)
+    reload_page(page)
+
+    wanted = [("Finished Size (mm)", FINISHED_SIZE)] + list(zip(CONFIG_LABELS, cfg))
+    try:
+        missing = restore_state(page, snap, wanted, reload_page)
+        apply_changes(page, missing, cfg)
+        method = "partial" if missing else "restored"
+    except Exception as e:
+        log(f"State restore failed, replaying every dropdown: {e}")
+        forget_selection(page)
+        apply_current_config(page, *cfg)
+        method, missing = "replayed", wanted
+
+    elapsed = time.perf_counter() - started
+    RECOVERIES.record(method, elapsed, len(missing))
+    log(f"Recovered in {elapsed:.1f}s ({method}, {len(missing)} dropdowns replayed)")
+
+
+def price_quantity(page, cfg, qty):
+    # Final price for one quantity, or None after the reload retry failed
+    # With --aimd, only the controller's current number of workers
+    # price at once
+    with CONTROLLER.slot() if CONTROLLER else nullcontext():
+        for attempt in range(1, 3):  # retry once after reload
+            try:
+                select_option(page, "Quantity", qty)
+                price = get_price(page)
+
+                final_price = price - 10
+                print(f"{price} {final_price:.2f}", flush=True)
+                return final_price
+
+            except Exception as e:
+                log(f"QTY ERROR (qty={qty}) ❌ {e}")
+
+                if attempt == 2:
+                    return None
+
+                log("Reloading page and restoring config…")
+                recover(page, cfg)
+
+
+def scrape_config(page, writer, cp, cs, lm, ip, ist, pg, previous=None):
+    # previous: the config already on screen (None = unknown, select all).
+    # Returns False when the widget state can't be trusted afterwards.
+    cfg = (cp, cs, lm, ip, ist, pg)
+    config = config_name(*cfg)
+
+    log("=" * 60)
+    log(f"START CONFIG: {config}")
+
+    results = []  # [(qty, final price or None, source)]
+    error = None
+    started = time.perf_counter()
+    quantities = todo_quantities(cfg)
+
+    try:
+        changes = delta(CONFIG_LABELS, previous, cfg)
+        # With --aimd, dropdown changes count against the worker limit too
+        with CONTROLLER.slot() if CONTROLLER else nullcontext():
+            if previous is not None and previous[:-1] != cfg[:-1]:
+                with timed_wait("prefix_switch"):
+                    apply_changes(page, changes, cfg)
+            else:
+                apply_changes(page, changes, cfg)
+
+        if INTERPOLATION:
+            results = price_with_interpolation(
+                quantities,
+                lambda qty: price_quantity(page, cfg, qty),
+                seed=config,
+                log=log,
+                **INTERPOLATION,
+            )
+        else:
+            for qty in quantities:
+                if BUDGET and BUDGET.expired():
+                    # Unpriced quantities stay out of the journal and are
+                    # picked up by the next run
+                    raise Exception("time budget used up mid-config")
+                results.append((qty, price_quantity(page, cfg, qty), "scraped"))
+
+    except Exception as e:
+        log(f"CONFIG ERROR ❌ {e}")
+        error = str(e)
+
+    if BUDGET:
+        # Fitted prices cost nothing; only widget round trips count
+        priced = sum(source != "interpolated" for _, _, source in results)
+        BUDGET.record(time.perf_counter() - started, priced,
+                      complete=error is None)
+    # Journaled by the store after it committed the rows
+    priced = [(qty, price) for qty, price, _ in results if price is not None]
+    writer.write_config(cfg, results, error, journal=priced)
+    return error is None
+
+
+def todo_quantities(cfg):
+    # Quantities still to price; configs in REFRESH are priced again
+    # whatever the journal says
+    if not JOURNAL or cfg in REFRESH:
+        return list(QUANTITIES)
+    return [qty for qty in QUANTITIES if not JOURNAL.is_done(cfg, qty)]
+
+
+class BrowserDisconnected(Exception):
+    # The browser went away mid-run (browser_server.py restarted it);
+    # left: the configs still to do, the interrupted one first
+    def __init__(self, left):
+        super().__init__(f"browser disconnected, {len(left)} configs left")
+        self.left = left
+
+
+def check_connected(page, left):
+    browser = page.context.browser
+    if browser is not None and not browser.is_connected():
+        raise BrowserDisconnected(left)
+
+
+def scrape_all(page, writer, configs):
+    previous = open_widget(page, configs[0])
+
+    if ADAPTIVE_PAGES:
+        groups = group_by_prefix(configs)
+        for i, (prefix, pages) in enumerate(groups):
+            check_connected(page, [
+                before + (pg,) for before, group in groups[max(0, i - 1):]
+                for pg in group
+            ])
+            # The sampler prices an unknown share of the pages; budget
+            # for one config at a time
+            if BUDGET and not BUDGET.can_start(len(QUANTITIES)):
+                BUDGET.stop(sum(len(p) for _, p in groups[i:]), len(QUANTITIES))
+                return
+            previous = scrape_prefix_adaptive(page, writer, prefix, pages,
+                                              previous)
+        return
+
+    ok = True
+    for i, cfg in enumerate(configs):
+        # A failed config before a lost browser is redone after reconnecting
+        check_connected(page, configs[i if ok else max(0, i - 1):])
+        quantities = todo_quantities(cfg)
+        if not quantities:
+            log(f"SKIP (journal): {config_name(*cfg)}")
+            continue
+        if BUDGET and not BUDGET.can_start(len(quantities)):
+            BUDGET.stop(len(configs) - i, len(quantities))
+            return
+        ok = scrape_config(page, writer, *cfg, previous=previous)
+        previous = cfg if ok else None
+
+
+# =====================================================
+# ADAPTIVE PAGE SWEEP (--adaptive-pages)
+# =====================================================
+def group_by_prefix(configs):
+    # [(options without pages, [pages])] in first-seen order
+    groups = {}
+    for cfg in configs:
+        groups.setdefault(cfg[:-1], []).append(cfg[-1])
+    return list(groups.items())
+
+
+class ResultCapture:
+    # Passes results on to the real writer and keeps the prices
+    def __init__(self, writer):
+        self.writer = writer
+        self.prices = {}
+
+    def write_config(self, cfg, results, error=None, journal=()):
+        self.writer.write_config(cfg, results, error, journal)
+        for qty, price, *_ in results:
+            if price is not None:
+                self.prices[qty] = price
+
+
+def scrape_prefix_adaptive(page, writer, prefix, pages, previous):
+    state = {"previous": previous}
+    conn = connect(STORE.path)
+
+    def fetch(pg):
+        cfg = prefix + (pg,)
+        if JOURNAL and JOURNAL.config_done(cfg, QUANTITIES):
+            # Priced by an earlier run: read it back instead
+            return dict(price_curve(conn, cfg))
+
+        capture = ResultCapture(writer)
+        ok = scrape_config(page, capture, *cfg, previous=state["previous"])
+        state["previous"] = cfg if ok else None
+        if len(capture.prices) < len(QUANTITIES):
+            # Quantities priced by an earlier run are in the store
+            capture.prices = {**dict(price_curve(conn, cfg)), **capture.prices}
+        return capture.prices
+
+    try:
+        _, filled = sample_pages(pages, fetch, log=log, **ADAPTIVE_PAGES)
+    finally:
+        conn.close()
+
+    for pg, prices in sorted(filled.items()):
+        writer.write_config(prefix + (pg,), [
+            (qty, price, "interpolated", low, high)
+            for qty, (price, low, high) in sorted(prices.items())
+        ])
+    return state["previous"]
+
+
+# =====================================================
+# OPTION CATALOG (--catalog)
+# =====================================================
+def check_catalog(browser, configs, path, force=False):
+    # Drops configs using options the widget no longer offers; re-crawls
+    # the catalog first if the widget bundle changed
+    context = new_context(browser)
+    try:
+        page = context.new_page()
+        install_network_tracker(page)
+        install_widget_observer(page)
+        catalog = refresh_catalog(
+            page, URL, select_dropdown, path, force,
+            relevant=lambda url: REQUEST_FILTER.verdict(url, "script") is None,
+            log=log,
+        )
+    finally:
+        context.close()
+    DEPENDENCIES.seed(catalog.get("resets", {}))
+
+    kept = []
+    reported = set()
+    for cfg in configs:
+        choices = {"Finished Size (mm)": FINISHED_SIZE}
+        choices.update((label, str(v)) for label, v in zip(CONFIG_LABELS, cfg))
+        bad = tuple(invalid_choices(catalog, choices))
+        if not bad:
+            kept.append(cfg)
+        elif bad not in reported:
+            reported.add(bad)
+            log("SKIP (not offered): " + ", ".join(f"{l} = {t}" for l, t in bad))
+    log(f"Catalog check: {len(kept)} of {len(configs)} configs still valid")
+    return kept
+
+
+# =====================================================
+# WORKER (one isolated context in the shared browser)
+# =====================================================
+def launch_browser(p, cdp_port):
     log("Launching browser")
-    browser = p.chromium.launch(
+    return p.chromium.launch(
         headless=True,
-        args=["--no-sandbox", "--disable-dev-shm-usage"]
+        args=[
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            f"--remote-debugging-port={cdp_port}",
+        ]
     )
-    page = browser.new_page()
-
-    page.goto(URL, timeout=60000)
-    page.wait_for_load_state("networkidle")
-    log("Page loaded")
-
-    
-    cp = list(COVER_PRINTING.keys())[0]
-    cs = list(COVER_STOCK.keys())[0]
-    lm = list(LAMINATE.keys())[0]
-    ip = list(INTERNAL_PRINTING.keys())[0]
-    ist = list(INTERNAL_STOCK.keys())[0]
-
-    time.sleep(3)
-    select_option(page, "Finished Size (mm)", "A5 Portrait - 148x210")
-    time.sleep(1)
-    select_option(page, "Cover Printing", cp)
-    time.sleep(1)
-    select_option(page, "Cover Stock", cs)
-    time.sleep(1)
-    select_option(page, "Cover Laminate (outside only)", lm)
-    time.sleep(1)
-    force_internal_printing(page, ip)
-    time.sleep(1)
-    select_option(page, "Internal/Text Pages Stock", ist)
 
-    for cp, cs, lm, ip, ist, pg in product(
-        COVER_PRINTING,
-        COVER_STOCK,
-        LAMINATE,
-        INTERNAL_PRINTING,
-        INTERNAL_STOCK,
-        PAGES
-    ):
-        config = (
-            f"A5P_{COVER_PRINTING[cp]}_{COVER_STOCK[cs]}_"
-            f"{LAMINATE[lm]}_{INTERNAL_PRINTING[ip]}_{INTERNAL_STOCK[ist]}_pp{pg}"
+
+def new_context(browser):
+    context = browser.new_context()
+    if REQUEST_FILTER:
+        REQUEST_FILTER.install(context)
+    return context
+
+
+def scrape_attached(browser, writer, configs, reconnect=None):
+    # scrape_all in a fresh context; when the browser goes away and
+    # reconnect() can attach again, carries on where it stopped
+    while True:
+        context = new_context(browser)
+        try:
+            scrape_all(context.new_page(), writer, configs)
+            return
+        except BrowserDisconnected as e:
+            if reconnect is None:
+                raise
+            log(f"{e}, reconnecting")
+            configs = e.left
+            browser = reconnect()
+        finally:
+            try:
+                context.close()
+            except Exception:
+                pass  # went with the browser
+
+
+def run_worker(worker_id, configs, writer, endpoint, shared=False):
+    # The sync API is bound to the thread that started it, so every
+    # worker runs its own driver and attaches to the shared Chromium:
+    # browser_server.py over its ws endpoint, our own launch over CDP.
+    with sync_playwright() as p:
+        log(f"Worker {worker_id}: {len(configs)} configs")
+        reconnect = (lambda: connect_browser(p, endpoint, log=log)) if shared else None
+        try:
+            browser = reconnect() if reconnect else p.chromium.connect_over_cdp(endpoint)
+            scrape_attached(browser, writer, configs, reconnect)
+        except Exception as e:
+            log(f"WORKER {worker_id} FAILED ❌ {e}")
+
+    log(f"Worker {worker_id} done")
+
+
+def scrape_in_browser(browser, writer, configs, workers, endpoint,
+                      shared=False, p=None):
+    # One page, or one thread and context per worker attached to it.
+    # shared: attached to browser_server.py, which restarts the browser;
+    # then workers attach again (p: the caller's driver, for one worker)
+    if workers == 1:
+        scrape_attached(
+            browser, writer, configs,
+            (lambda: connect_browser(p, endpoint, log=log)) if shared else None,
         )
+        return
 
-        log("=" * 60)
-        log(f"START CONFIG: {config}")
+    if ADAPTIVE_PAGES:
+        chunks = partition_by_prefix(configs, workers)
+    else:
+        chunks = partition(configs, workers)
+    log(f"Starting {len(chunks)} workers on {endpoint}")
+
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(i + 1, chunk, writer, endpoint, shared),
+            name=f"worker-{i + 1}",
+        )
+        for i, chunk in enumerate(chunks)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# =====================================================
+# SHARD PROCESSES (--processes, process_pool.py)
+# =====================================================
+def run_shards(writer, configs, args):
+    chunks = [c for c in partition(configs, args.processes) if c]
+    # Catalog edges found by the parent, so shards don't re-learn them
+    seeds = {label: sorted(t) for label, t in DEPENDENCIES.learned.items()}
+    written = run_pool(run_shard, chunks, (args, seeds, REFRESH), writer, log)
+    log(f"Shards wrote {sum(written.values())} of {len(configs)} configs")
 
-        # Open in append mode inside the loop to "save" frequently
-        with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
-            f.write(config + "\n")
 
+def run_shard(shard, configs, results, args, seeds, refresh):
+    # Runs in a spawned process: own settings, own browser on its own
+    # debugging port, results and journal entries to the parent
+    global JOURNAL, REFRESH
+    asset_cache = configure(args)
+    REFRESH = refresh
+    DEPENDENCIES.seed(seeds)
+    JOURNAL = QueueJournal(args.journal)
+    writer = QueueWriter(shard, results)
+    port = args.cdp_port + shard
+    log(f"Shard {shard}: {len(configs)} configs")
+
+    try:
+        with sync_playwright() as p:
+            browser, shared = open_browser(p, args.browser_endpoint,
+                                           lambda: launch_browser(p, port),
+                                           log=log)
             try:
-                time.sleep(1)
-                select_option(page, "Internal/Text Pages (pp) Excluding Cover", pg)
-                
-                for qty in QUANTITIES:
-                    for attempt in range(1, 3):  # retry once after reload
-                        try:
-                            # log(f"Quantity {qty} (attempt {attempt})")
+                scrape_in_browser(browser, writer, configs,
+                                  max(1, min(args.workers, len(configs))),
+                                  args.browser_endpoint
+                                  or f"http://127.0.0.1:{port}", shared, p)
+            finally:
+                browser.close()
+    except Exception as e:
+        log(f"SHARD {shard} FAILED ❌ {e}")
+    finally:
+        REQUEST_FILTER.close()
+        if asset_cache:
+            asset_cache.close()
+        if args.instrument:
+            dump_step_timings(log)
+        log(f"Shard {shard}: price sources {PRICE_SOURCES.summary()}, "
+            f"selection cache {cache_summary()}")
+        if BUDGET:
+            log(f"Shard {shard}: time budget {BUDGET.summary()}")
+        if CONTROLLER:
+            log(f"Shard {shard}: AIMD {CONTROLLER.summary()}")
+        results.put(("done", shard))
+
+
+# =====================================================
+# MAIN
+# =====================================================
+def use_job(path):
+    # Option sets, pages and quantities come from a job spec (--job)
+    global JOB, PAGES, QUANTITIES
+    global COVER_PRINTING, COVER_STOCK, LAMINATE, INTERNAL_PRINTING, INTERNAL_STOCK
+    JOB = load_job(path)
+    (COVER_PRINTING, COVER_STOCK, LAMINATE, INTERNAL_PRINTING,
+     INTERNAL_STOCK) = JOB.options
+    PAGES = JOB.pages
+    QUANTITIES = JOB.quantities or QUANTITIES
+    log(f"Job: {JOB.name}")
+
+
+def configure(args):
+    # Module settings from the command line; shard processes call this
+    # again with the parent's arguments
+    global CAPTURE_XHR, PRICE_URL, SELECTION_CACHE, INTERPOLATION
+    global ADAPTIVE_PAGES, URL, REQUEST_FILTER, BUDGET, CONTROLLER
+    if args.job:
+        use_job(args.job)
+    if args.deadline:
+        BUDGET = TimeBudget(args.deadline, args.budget_reserve, log)
+    if args.aimd:
+        CONTROLLER = AIMDController(args.workers, args.aimd_window, log)
+        add_listener(CONTROLLER.observe)
+    if args.adaptive_pages:
+        ADAPTIVE_PAGES = {
+            "coarse_step": args.coarse_step,
+            "tolerance": args.page_tolerance,
+        }
+    if args.interpolate:
+        INTERPOLATION = {
+            "anchors": (
+                [int(q) for q in args.anchors.split(",")]
+                if args.anchors else DEFAULT_ANCHORS
+            ),
+            "spot_checks": args.spot_checks,
+            "tolerance": args.tolerance,
+        }
+    if args.instrument:
+        enable_instrumentation(log)
+    if args.url:
+        URL = args.url
+    asset_cache = None
+    if not args.no_asset_cache:
+        asset_cache = AssetCache(args.asset_cache,
+                                 max_bytes=args.asset_cache_mb * 1024 * 1024)
+    REQUEST_FILTER = RequestFilter(
+        URL,
+        allow_hosts=ALLOW_HOSTS + tuple(args.allow_host),
+        block=not args.no_block_assets,
+        cache=asset_cache,
+    )
+    CAPTURE_XHR = args.capture_xhr
+    SELECTION_CACHE = not args.no_selection_cache
+    if args.price_url:
+        PRICE_URL = re.compile(args.price_url, re.IGNORECASE)
+    return asset_cache
 
-                            select_option(page, "Quantity", qty)
-                            price = get_price(page)
 
-                            final_price = price - 10
-                            print(f"{price} {final_price:.2f}")
-                            f.write(f"{qty};;{final_price:.2f}\n")
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--job", metavar="TOML",
+                        help="price the option sets of a job spec (jobs.py)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="isolated browser contexts to run side by side")
+    parser.add_argument("--shard", type=parse_shard, default=None,
+                        metavar="I/N",
+                        help="price only block I of N of the planned configs "
+                             "(one per CI machine; merge with shard_merge.py)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="shard processes, each with its own browser "
+                             "(and --workers contexts)")
+    parser.add_argument("--cdp-port", type=int, default=CDP_PORT,
+                        help="shard N uses this port + N")
+    parser.add_argument("--browser-endpoint",
+                        default=os.environ.get(ENDPOINT_ENV),
+                        help="attach to browser_server.py instead of launching "
+                             f"(default: ${ENDPOINT_ENV})")
+    parser.add_argument("--capture-xhr", action="store_true",
+                        help="read prices from the pricing XHR, DOM as fallback")
+    parser.add_argument("--price-url", default=None,
+                        help="regex matching the pricing XHR url")
+    parser.add_argument("--no-selection-cache", action="store_true",
+                        help="always re-select dropdowns, even when already set")
+    parser.add_argument("--journal", default=JOURNAL_FILE,
+                        help="progress journal; priced tuples in it are skipped")
+    parser.add_argument("--store", default=STORE_FILE,
+                        help="SQLite price store")
+    parser.add_argument("--txt-output", nargs="?", const=OUTPUT_FILE,
+                        default=None,
+                        help="also write the legacy qty;;price text file")
+    parser.add_argument("--interpolate", action="store_true",
+                        help="scrape anchor quantities only and fit the rest")
+    parser.add_argument("--anchors", default=None,
+                        help="comma-separated anchor quantities")
+    parser.add_argument("--spot-checks", type=int, default=DEFAULT_SPOT_CHECKS)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="max relative spot-check error before full scrape")
 
-                            break  # success → exit retry loop
+    parser.add_argument("--adaptive-pages", action="store_true",
+                        help="coarse page grid + bisection, fill the rest")
+    parser.add_argument("--coarse-step", type=int, default=DEFAULT_COARSE_STEP)
+    parser.add_argument("--page-tolerance", type=float,
+                        default=DEFAULT_PAGE_TOLERANCE)
+    parser.add_argument("--url", default=None,
+                        help="widget page instead of the live one "
+                             "(e.g. the local fixture_server.py)")
+    parser.add_argument("--max-configs", type=int, default=None,
+                        help="price at most this many configs (benchmarks)")
+    parser.add_argument("--no-block-assets", action="store_true",
+                        help="load images/fonts/trackers (learns their sizes)")
+    parser.add_argument("--allow-host", action="append", default=[],
+                        help="extra host the widget needs (repeatable)")
+    parser.add_argument("--asset-cache", default=CACHE_DIR,
+                        help="on-disk cache for the widget's scripts/styles")
+    parser.add_argument("--no-asset-cache", action="store_true")
+    parser.add_argument("--asset-cache-mb", type=int,
+                        default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--catalog", nargs="?", const=CATALOG_FILE,
+                        help="check configs against the widget's option "
+                             f"catalog (default file: {CATALOG_FILE})")
+    parser.add_argument("--recrawl", action="store_true",
+                        help="re-crawl the catalog even if the widget is unchanged")
+    parser.add_argument("--instrument", action="store_true",
+                        help="per-step latency histograms (kill -USR1 to dump)")
+    parser.add_argument("--aimd", action="store_true",
+                        help="adapt active workers (up to --workers) and the "
+                             "pause between actions to latency/errors/retries")
+    parser.add_argument("--aimd-window", type=int, default=AIMD_WINDOW,
+                        help="widget round trips per AIMD decision")
+    parser.add_argument("--time-budget", type=parse_duration, default=None,
+                        help="stop starting configs so the run ends within "
+                             "this long (340m, 5.5h); missing data first, "
+                             "then the stalest")
+    parser.add_argument("--budget-reserve", type=float, default=DEFAULT_RESERVE,
+                        help="seconds of the budget kept for the final flush")
+    args = parser.parse_args()
+    # Wall clock, so shard processes stop at the same moment
+    args.deadline = time.time() + args.time_budget if args.time_budget else None
+    if args.processes > 1 and args.adaptive_pages:
+        parser.error("--adaptive-pages reads the store, use --processes 1")
 
-                        except Exception as e:
-                            log(f"QTY ERROR (qty={qty}) ❌ {e}")
+    global JOURNAL, STORE, REFRESH
+    asset_cache = configure(args)
 
-                            if attempt == 2:
-                                f.write(f"{qty};;ERROR\n")
-                                break
+    JOURNAL = ProgressJournal(args.journal)
+    log(f"Journal: {JOURNAL.summary()}")
 
-                            log("Reloading page and restoring config…")
-                            page.reload(timeout=60000)
+    configs = build_configs()
+    if args.shard:
+        # Sliced before the journal filter, so the blocks don't depend
+        # on what each machine has already priced
+        configs = shard_slice(configs, *args.shard)
+        log(f"Shard {args.shard[0]}/{args.shard[1]}: {len(configs)} configs")
+    if BUDGET and not ADAPTIVE_PAGES:
+        conn = connect(args.store)
+        try:
+            ages = last_scraped(conn)
+        finally:
+            conn.close()
+        missing, priced = by_priority(
+            configs, lambda cfg: not JOURNAL.config_done(cfg, QUANTITIES), ages)
+        REFRESH = frozenset(priced)
+        configs = missing + priced
+        log(f"Time budget {args.time_budget / 60:.0f} min: {len(missing)} "
+            f"missing configs first, then {len(priced)} priced ones, "
+            f"stalest first")
+    elif not ADAPTIVE_PAGES:
+        # The sampler needs finished page counts too, as curve points
+        configs = [
+            cfg for cfg in configs
+            if not JOURNAL.config_done(cfg, QUANTITIES)
+        ]
+    if args.max_configs is not None:
+        configs = configs[:args.max_configs]
+    log(f"{len(configs)} configs left to price")
+    store = STORE = PriceStore(args.store, journal=JOURNAL)
+    writer = output_for(store, args.txt_output)
+    workers = max(1, min(args.workers, len(configs)))
 
-                            apply_current_config(
-                                page,
-                                cp, cs, lm, ip, ist, pg
-                            )
+    if not configs:
+        JOURNAL.close()
+        log("DONE ✔ Nothing left to price")
+        return
 
-                f.write("\n") # Add a newline between configurations
+    try:
+        with sync_playwright() as p:
+            browser, shared = None, False
+            launch_seconds = 0.0
+            if args.processes == 1 or args.catalog:
+                launch_started = time.perf_counter()
+                browser, shared = open_browser(
+                    p, args.browser_endpoint,
+                    lambda: launch_browser(p, args.cdp_port), log=log,
+                )
+                launch_seconds = time.perf_counter() - launch_started
+
+            if args.catalog:
+                configs = check_catalog(browser, configs, args.catalog,
+                                        args.recrawl)
+                workers = max(1, min(args.workers, len(configs)))
+
+            if not configs:
+                log("No configs left after the catalog check")
+            elif args.processes > 1:
+                # Shards launch their own browsers
+                if browser:
+                    browser.close()
+                    browser = None
+                run_shards(writer, configs, args)
+            else:
+                scrape_in_browser(browser, writer, configs, workers,
+                                  args.browser_endpoint
+                                  or f"http://127.0.0.1:{args.cdp_port}",
+                                  shared, p)
+
+            if browser:
+                # On a shared server this only drops our contexts
+                log("Detaching from browser server" if shared
+                    else "Closing browser")
+                browser.close()
+    finally:
+        store.close()
+        JOURNAL.close()
+        REQUEST_FILTER.close()
+        if asset_cache:
+            asset_cache.close()
+        if args.instrument:
+            # Also on Ctrl-C, when the numbers are most wanted
+            dump_step_timings(log)
+
+    log(f"Price sources: {PRICE_SOURCES.summary()}")
+    log(f"Selection cache: {cache_summary()}")
+    log(f"Request filter: {REQUEST_FILTER.summary()}")
+    if asset_cache:
+        log(f"Asset cache: {asset_cache.summary()}")
+    log(f"Journal: {JOURNAL.summary()}")
+    log(f"Recoveries: {RECOVERIES.summary()}")
+    log(f"Dependencies: {DEPENDENCIES.summary()}")
+    for row in DEPENDENCIES.edges():
+        log(f"EDGE {row}")
+    if JOB:
+        saved = savings_summary(configs, launch_seconds,
+                                WAIT_TIMES.times["widget_setup"],
+                                WAIT_TIMES.times["prefix_switch"])
+        log(f"Job setup: {saved}")
+    for row in WAIT_TIMES.summary():
+        log(f"WAIT {row}")
+    if BUDGET:
+        log(f"Time budget: {BUDGET.summary()}")
+    if CONTROLLER:
+        log(f"AIMD: {CONTROLLER.summary()}")
+    log(f"DONE ✔ {store.rows_written} rows written to {args.store}")
 
-            except Exception as e:
-                log(f"CONFIG ERROR ❌ {e}")
-                f.write("CONFIG ERROR\n\n")
-                
-    log("Closing browser")
-    browser.close()
 
-log("DONE ✔ Output written to A5_PERFECT_BOUND_OUTPUT.txt")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import threading
+import weakref
+
+# =====================================================
+# SELECTION-STATE CACHE
+# =====================================================
+# Remembers the last confirmed value of every control-group so a
+# selection that is already on screen costs one evaluate() instead of
+# open → click → verify. The cache is dropped whenever the widget
+# rebuilds its controls or the document is reloaded.
+
+# Each document gets a random id; a MutationObserver bumps a counter when
+# .control-group nodes are added or removed (the widget rebuilding).
+WIDGET_OBSERVER_JS = """
+(() => {
+  if (window.__pqObserver) return;
+  window.__pqObserver = true;
+  window.__pqDocId = Math.random().toString(36).slice(2);
+  window.__pqWidgetGen = 0;
+  const touchesGroups = nodes => Array.from(nodes).some(n =>
+    n.nodeType === 1 && (n.matches('.control-group')
+      || n.querySelector('.control-group')));
+  const start = () => new MutationObserver(records => {
+    for (const r of records) {
+      if (touchesGroups(r.addedNodes) || touchesGroups(r.removedNodes)) {
+        window.__pqWidgetGen += 1;
+        return;
+      }
+    }
+  }).observe(document.documentElement, { childList: true, subtree: true });
+  if (document.documentElement) start();
+  else document.addEventListener('DOMContentLoaded', start);
+})();
+"""
+
+WIDGET_TOKEN_JS = "() => [window.__pqDocId || null, window.__pqWidgetGen || 0]"
+
+
+def install_widget_observer(page):
+    page.add_init_script(WIDGET_OBSERVER_JS)
+    page.evaluate(WIDGET_OBSERVER_JS)
+
+
+def widget_token(page):
+    return tuple(page.evaluate(WIDGET_TOKEN_JS))
+
+
+class SelectionCache:
+    def __init__(self):
+        self.values = {}
+        self.token = None
+
+    def sync(self, token):
+        if token != self.token:
+            self.values.clear()
+            self.token = token
+
+    # The *_token variants take a token the caller read itself (the
+    # async engine evaluates WIDGET_TOKEN_JS on its own event loop)
+    def lookup_token(self, token, label, value):
+        self.sync(token)
+        return self.values.get(label) == str(value)
+
+    def store_token(self, token, label, value):
+        self.sync(token)
+        self.values[label] = str(value)
+
+    def lookup(self, page, label, value):
+        return self.lookup_token(widget_token(page), label, value)
+
+    def store(self, page, label, value, token=None):
+        # Re-read the token unless the caller just did: this selection
+        # may itself have rebuilt the widget and reset the other controls
+        if token is None:
+            token = widget_token(page)
+        self.store_token(token, label, value)
+
+    def forget(self, label=None):
+        if label is None:
+            self.values.clear()
+        else:
+            self.values.pop(label, None)
+
+
+# =====================================================
+# ONE CACHE PER PAGE + RUN-WIDE COUNTERS
+# =====================================================
+_caches = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def cache_for(page):
+    with _lock:
+        cache = _caches.get(page)
+        if cache is None:
+            cache = _caches[page] = SelectionCache()
+        return cache
+
+
+def count_lookup(hit):
+    with _lock:
+        _stats["hits" if hit else "misses"] += 1
+    return hit
+
+
+def already_selected(page, label, value):
+    return count_lookup(cache_for(page).lookup(page, label, value))
+
+
+def remember_selection(page, label, value, token=None):
+    cache_for(page).store(page, label, value, token)
+
+
+def forget_selection(page, label=None):
+    cache_for(page).forget(label)
+
+
+def cache_summary():
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    ratio = hits / total if total else 0
+    return f"hits={hits} misses={misses} hit_ratio={ratio:.0%}"
@@ -0,0 +1,198 @@
+import argparse
+import os
+
+from journal import ProgressJournal
+from price_store import (
+    FINISHED_SIZE,
+    INSERT_ERROR,
+    INSERT_PRICE,
+    KEY_COLUMNS,
+    OPTION_COLUMNS,
+    PRODUCT,
+    connect,
+)
+
+# =====================================================
+# SHARD STORE MERGE
+# =====================================================
+# CI runs one scrapper.py --shard i/N per matrix job, each writing its
+# own prices.sqlite3. This folds them into one store:
+#
+#   - one row per key (product, size, options, pages, qty): the newest,
+#     so keys priced by two shards (or twice by one) are not doubled
+#   - scrape errors only for keys no shard managed to price
+#   - optionally a journal of every merged key, so a later unsharded
+#     run resumes from the merged result
+#
+# and reports the holes: planned (config, qty) pairs nobody priced.
+#
+# Locally, against the mock widget:
+#
+#     python fixture_server.py &
+#     for i in 1 2 3; do
+#       python scrapper.py --url http://127.0.0.1:8765/ --shard $i/3 \
+#         --store shard-$i.sqlite3 --journal shard-$i.journal \
+#         --cdp-port $((9300 + i)) &
+#     done; wait
+#     python shard_merge.py --out prices.sqlite3 shard-*.sqlite3
+
+PRICE_COLUMNS = KEY_COLUMNS + ("price", "scraped_at", "source", "price_low",
+                               "price_high")
+ERROR_COLUMNS = KEY_COLUMNS + ("message", "scraped_at")
+
+STAMP = len(KEY_COLUMNS) + 1  # scraped_at in a PRICE_COLUMNS row
+
+
+def log(msg):
+    print(f"[LOG] {msg}", flush=True)
+
+
+def merge_stores(inputs, out, log=log):
+    newest = {}  # key → newest PRICE_COLUMNS row
+    owner = {}  # key → input it was first seen in
+    overlaps = conflicts = rows_read = 0
+    errors = set()
+
+    for path in inputs:
+        if not os.path.exists(path):
+            log(f"Missing shard store {path}, skipped")
+            continue
+        conn = connect(path)
+        try:
+            n = 0
+            for row in conn.execute(
+                f"SELECT {', '.join(PRICE_COLUMNS)} FROM prices"
+            ):
+                n += 1
+                key = row[:len(KEY_COLUMNS)]
+                old = newest.get(key)
+                if old is None:
+                    owner[key] = path
+                    newest[key] = row
+                    continue
+                if owner[key] != path:
+                    overlaps += 1
+                    if abs(old[len(KEY_COLUMNS)] - row[len(KEY_COLUMNS)]) > 0.005:
+                        conflicts += 1
+                if row[STAMP] > old[STAMP]:
+                    newest[key] = row
+            errors.update(conn.execute(
+                f"SELECT {', '.join(ERROR_COLUMNS)} FROM scrape_errors"
+            ))
+        finally:
+            conn.close()
+        rows_read += n
+        log(f"{path}: {n} price rows")
+
+    errors = [e for e in errors if e[:len(KEY_COLUMNS)] not in newest]
+    conn = connect(out)
+    try:
+        with conn:
+            conn.executemany(INSERT_PRICE, sorted(newest.values()))
+            conn.executemany(INSERT_ERROR, sorted(
+                errors, key=lambda e: tuple("" if v is None else str(v) for v in e)
+            ))
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+    return {
+        "rows_read": rows_read,
+        "keys": len(newest),
+        "overlaps": overlaps,
+        "conflicts": conflicts,
+        "errors": len(errors),
+    }
+
+
+def write_journal(store, path):
+    # Journal entries for every price in the store
+    journal = ProgressJournal(path)
+    conn = connect(store)
+    try:
+        for row in conn.execute(
+            f"SELECT {', '.join(OPTION_COLUMNS)}, qty, price FROM prices"
+        ):
+            *cfg, qty, price = row
+            if not journal.is_done(cfg, qty):
+                journal.record(cfg, qty, price)
+    finally:
+        conn.close()
+        journal.close()
+    return journal
+
+
+def find_holes(conn, configs, quantities, product=PRODUCT, size=FINISHED_SIZE):
+    # {cfg: [qty]} of planned keys without a price
+    have = set(conn.execute(
+        f"SELECT {', '.join(OPTION_COLUMNS)}, qty FROM prices "
+        f"WHERE product = ? AND size = ?",
+        (product, size),
+    ))
+    holes = {}
+    for cfg in configs:
+        options = tuple(str(v) for v in cfg[:-1]) + (int(cfg[-1]),)
+        missing = [q for q in quantities if options + (int(q),) not in have]
+        if missing:
+            holes[cfg] = missing
+    return holes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="merge per-shard price stores and report holes")
+    parser.add_argument("inputs", nargs="+", help="shard stores")
+    parser.add_argument("--out", required=True, help="merged store to create")
+    parser.add_argument("--force", action="store_true",
+                        help="replace --out if it exists")
+    parser.add_argument("--journal", default=None,
+                        help="also write a journal of the merged prices")
+    parser.add_argument("--job", metavar="TOML",
+                        help="the job the shards ran, for the hole report")
+    parser.add_argument("--show", type=int, default=20,
+                        help="list at most this many incomplete configs")
+    parser.add_argument("--fail-on-holes", action="store_true")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        if not args.force:
+            parser.error(f"{args.out} exists (use --force to replace it)")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.out + suffix):
+                os.remove(args.out + suffix)
+
+    stats = merge_stores(args.inputs, args.out)
+    log(f"Merged {stats['rows_read']} rows into {stats['keys']} keys: "
+        f"{stats['overlaps']} overlapping ({stats['conflicts']} with "
+        f"different prices), {stats['errors']} unresolved errors")
+    if args.journal:
+        journal = write_journal(args.out, args.journal)
+        log(f"Journal: {journal.summary()}")
+
+    import scrapper
+
+    if args.job:
+        scrapper.use_job(args.job)
+    configs = scrapper.build_configs()
+    conn = connect(args.out)
+    try:
+        holes = find_holes(conn, configs, scrapper.QUANTITIES)
+    finally:
+        conn.close()
+
+    missing = sum(len(q) for q in holes.values())
+    empty = sum(len(q) == len(scrapper.QUANTITIES) for q in holes.values())
+    log(f"Holes: {len(holes)} of {len(configs)} configs incomplete "
+        f"({empty} not priced at all), {missing} prices missing")
+    for cfg, qtys in list(holes.items())[:args.show]:
+        if len(qtys) == len(scrapper.QUANTITIES):
+            which = "all quantities"
+        else:
+            which = "qty " + ",".join(map(str, qtys))
+        log(f"HOLE {scrapper.config_name(*cfg)}: {which}")
+    if args.fail_on_holes and holes:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
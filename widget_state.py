@@ -0,0 +1,129 @@
+import threading
+from collections import defaultdict
+
+from dependencies import shows
+from readiness import wait_widget_ready
+from selection_cache import remember_selection
+
+# =====================================================
+# WIDGET STATE SNAPSHOT / RESTORE
+# =====================================================
+# Recovering from a failed quantity used to mean reload + re-selecting
+# all seven dropdowns. A reload keeps the URL and both web storages, and
+# if the widget keeps its selections there it comes back already
+# configured. So before reloading we snapshot URL + storage. Afterwards
+# we go back to the snapshot URL if the reload landed elsewhere (the
+# widget's URL parameters carry selections too), put storage back if it
+# was wiped, read every dropdown's on-screen value in a single
+# evaluate(), and only the ones that are wrong are replayed, by the
+# caller.
+
+SNAPSHOT_JS = """
+() => {
+  const dump = s => {
+    const out = {};
+    for (let i = 0; i < s.length; i++) out[s.key(i)] = s.getItem(s.key(i));
+    return out;
+  };
+  return { url: location.href, local: dump(localStorage),
+           session: dump(sessionStorage) };
+}
+"""
+
+RESTORE_STORAGE_JS = """
+snap => {
+  for (const [k, v] of Object.entries(snap.local)) localStorage.setItem(k, v);
+  for (const [k, v] of Object.entries(snap.session)) sessionStorage.setItem(k, v);
+}
+"""
+
+# {dropdown label: text on its button}
+READ_SELECTIONS_JS = """
+() => Object.fromEntries(Array.from(
+  document.querySelectorAll('.control-group'),
+  g => [
+    (g.querySelector('label.control-label')?.textContent || '').trim(),
+    (g.querySelector('.filter-text')?.textContent || '').trim(),
+  ]).filter(([label]) => label))
+"""
+
+
+def snapshot(page):
+    # None when the page is too broken to read
+    try:
+        return page.evaluate(SNAPSHOT_JS)
+    except Exception:
+        return None
+
+
+def storage_lost(page, snap):
+    now = page.evaluate(SNAPSHOT_JS)
+    return any(
+        now[area].get(k) != v
+        for area in ("local", "session")
+        for k, v in snap[area].items()
+    )
+
+
+def read_selections(page):
+    return page.evaluate(READ_SELECTIONS_JS)
+
+
+def restore_state(page, snap, wanted, reload):
+    # After a reload: return to the snapshot URL if the page is not on it,
+    # bring back storage (one more reload) if the widget lost it, then
+    # compare the screen with wanted [(label, value)]. Matching dropdowns
+    # go into the selection cache; the rest are returned for the caller
+    # to replay.
+    wait_widget_ready(page)
+
+    if snap and snap["url"] and page.url != snap["url"]:
+        page.goto(snap["url"], timeout=60000)
+        wait_widget_ready(page)
+
+    if snap and (snap["local"] or snap["session"]) and storage_lost(page, snap):
+        page.evaluate(RESTORE_STORAGE_JS, snap)
+        reload(page)
+        wait_widget_ready(page)
+
+    on_screen = read_selections(page)
+    missing = []
+    for label, value in wanted:
+        # The loose match apply_changes accepts
+        if label in on_screen and shows(on_screen, label, value):
+            remember_selection(page, label, value)
+        else:
+            missing.append((label, value))
+    return missing
+
+
+# =====================================================
+# RECOVERY TIMINGS
+# =====================================================
+class RecoveryStats:
+    # Per method: "restored" (nothing replayed), "partial" (some
+    # dropdowns replayed) and "replayed" (restore failed, full replay)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.times = defaultdict(list)
+        self.replayed_dropdowns = 0
+
+    def record(self, method, seconds, replayed=0):
+        with self.lock:
+            self.times[method].append(seconds)
+            self.replayed_dropdowns += replayed
+
+    def summary(self):
+        with self.lock:
+            if not self.times:
+                return "no recoveries"
+            parts = []
+            for method, values in sorted(self.times.items()):
+                avg = sum(values) / len(values)
+                parts.append(f"{method}={len(values)} (avg {avg:.1f}s, "
+                             f"max {max(values):.1f}s)")
+            return ", ".join(parts) + \
+                f", {self.replayed_dropdowns} dropdowns replayed"
+
+
+RECOVERIES = RecoveryStats()